@@ -0,0 +1,293 @@
+import Common, Environment, DigitalProcessing, RealIntegration, argparse, platform, random, queue, json, time, math, sys
+import numpy
+
+
+def Time(Function, Repeats=5):
+    """Times a function, best and median of Repeats runs.
+
+    Args:
+        Function (callable): Function to time, called without arguments.
+        Repeats (int, optional): Number of runs. Defaults to 5.
+
+    Returns:
+        dict: {"min", "median"} in seconds.
+    """
+    Times = []
+    for i in range(Repeats):
+        start = time.perf_counter()
+        Function()
+        Times.append(time.perf_counter() - start)
+    return {"min": min(Times), "median": float(numpy.median(Times))}
+
+
+def MakeEnvironment(RockCount=15, SideSize=30, Seed=0):
+    """Builds the same random environment for the same arguments.
+
+    Args:
+        RockCount (int, optional): Number of rocks. Defaults to 15.
+        SideSize (int, optional): Size of the environment. Defaults to 30.
+        Seed (int, optional): Seed of the rock placement. Defaults to 0.
+
+    Returns:
+        Environment.Environment: The environment, with the robot at the center.
+    """
+    random.seed(Seed)
+    env = Environment.Environment(SideSize=SideSize, RockCount=RockCount, RockDiameter=1.5)
+    env.Rocks = [rock for rock in env.Rocks if not rock.IsIn(env.Robot.pos)]  # keep the robot free
+    return env
+
+
+def RobotScan(PointCount=360, Seed=0):
+    """Returns a robot frame scan of a seeded environment, the input of the processing benchmarks.
+
+    Args:
+        PointCount (int, optional): Points of the scan. Defaults to 360.
+        Seed (int, optional): Seed of the environment. Defaults to 0.
+
+    Returns:
+        list: Robot frame Positions.
+    """
+    env = MakeEnvironment(Seed=Seed)
+    return env.ScanLidarAnalytic(PointCount, randomize=0.05)[1]
+
+
+def RingPoints(PointCount=2000, Radius=10):
+    """Returns points evenly spaced on a circle, the worst case of the convex hull with every point a vertex.
+
+    Args:
+        PointCount (int, optional): Number of points. Defaults to 2000.
+        Radius (float, optional): Radius of the circle. Defaults to 10.
+
+    Returns:
+        list: Common.Positions in angular order.
+    """
+    return [Common.Position(Radius, i / PointCount * 2 * math.pi, False) for i in range(PointCount)]
+
+
+def CannedPackets(Rotations=10):
+    """Builds the byte stream of full lidar rotations, split the same way Serial.read_until splits it.
+
+    Args:
+        Rotations (int, optional): Number of 360 degree rotations. Defaults to 10.
+
+    Returns:
+        list: Packets, each ending with the start byte of the next packet.
+    """
+    Generator = numpy.random.default_rng(0)
+    Packets = []
+    for rotation in range(Rotations):
+        for index in range(90):  # 4 readings per packet
+            Distances = Generator.integers(20, 4000, 4)  # valid readings, in 1/20 units
+            Packet = [0xA0 + index]
+            for dist in Distances.tolist():
+                Packet += [dist & 0xFF, (dist >> 8) & 0b_0011_1111]
+            Packet += [0, 0, 0xFA]  # speed bytes, then the next start byte
+            Packets.append(bytes(Packet))
+    return Packets
+
+
+def StreamFrame(Processor, Points, Chunks=16):
+    """Processes a scan in angular chunks, the way StreamChunks sends it to the processor.
+
+    Args:
+        Processor (DigitalProcessing.LidarDataProcessor): Processor with BeginFrame, ProcessChunk and FinishFrame.
+        Points (list): Robot frame Positions of the scan.
+        Chunks (int, optional): Number of chunks. Defaults to 16.
+    """
+    Processor.BeginFrame()
+    for chunk in range(Chunks):
+        Processor.ProcessChunk(
+            Points[chunk * len(Points) // Chunks : (chunk + 1) * len(Points) // Chunks]
+        )
+    Processor.FinishFrame()
+
+
+def ScanCases(Quick=False):
+    """Scan benchmarks over the PointCount, RockCount, SideSize and scan method grid.
+
+    Args:
+        Quick (bool, optional): Use a smaller grid. Defaults to False.
+
+    Returns:
+        list: (name, function) pairs.
+    """
+    PointCounts = [90, 360] if Quick else [90, 360, 1440]
+    RockCounts = [5, 50] if Quick else [5, 50, 500]
+    SideSizes = [12, 30]
+    Cases = []
+    for Method in ["March", "Analytic", "Batch", "Sweep"]:
+        for PointCount in PointCounts:
+            for RockCount in RockCounts:
+                for SideSize in SideSizes:
+                    env = MakeEnvironment(RockCount, SideSize)
+                    Cases.append(
+                        (
+                            f"scan/{Method}/points={PointCount}/rocks={RockCount}/side={SideSize}",
+                            lambda env=env, Method=Method, PointCount=PointCount: env.Scan(
+                                Method, PointCount, env.SideSize / 1000, 0.05
+                            ),
+                        )
+                    )
+    return Cases
+
+
+def ProcessingCases(Quick=False):
+    """Benchmarks of AcceptableProcess, ConvexHullPoints, DetectClusters, streamed frames, the line wall filter and FindPOI over input sizes,
+        and ConvexHullPoints of rings, where every point is a hull vertex.
+
+    Args:
+        Quick (bool, optional): Use fewer input sizes. Defaults to False.
+
+    Returns:
+        list: (name, function) pairs.
+    """
+    Cases = []
+    for PointCount in [90, 360] if Quick else [90, 360, 1440, 5760]:
+        Points = RobotScan(PointCount)
+        Processor = DigitalProcessing.LidarDataProcessor()
+        Cases += [
+            (
+                f"process/AcceptableProcess/points={PointCount}",
+                lambda Processor=Processor, Points=Points: Processor.AcceptableProcess(Points),
+            ),
+            (
+                f"process/ConvexHullPoints/points={PointCount}",
+                lambda Processor=Processor, Points=Points: Processor.ConvexHullPoints(Points),
+            ),
+            (
+                f"process/DetectClusters/points={PointCount}",
+                lambda Processor=Processor, Points=Points: Processor.DetectClusters(Points, 0.05),
+            ),
+            (
+                f"process/StreamChunks/points={PointCount}",
+                lambda Processor=Processor, Points=Points: StreamFrame(Processor, Points),
+            ),
+            (
+                f"process/LineWallProcessor/points={PointCount}",
+                lambda Processor=DigitalProcessing.LineWallProcessor(), Points=Points: (
+                    Processor.AcceptableProcess(Points)
+                ),
+            ),
+            (
+                f"process/FindPOI/points={PointCount}",
+                lambda Processor=Processor, Points=Points: Processor.FindPOI(Points),
+            ),
+        ]
+    for PointCount in [2000] if Quick else [2000, 100000]:
+        Ring = RingPoints(PointCount)
+        Cases.append(
+            (
+                f"process/ConvexHullPoints/ring={PointCount}",
+                lambda Processor=Processor, Points=Ring: Processor.ConvexHullPoints(Points),
+            )
+        )
+    return Cases
+
+
+def ParsingCases(Quick=False):
+    """Benchmark of the lidar packet parsing on a canned byte stream.
+
+    Args:
+        Quick (bool, optional): Parse fewer rotations. Defaults to False.
+
+    Returns:
+        list: (name, function) pairs.
+    """
+    Rotations = 2 if Quick else 10
+    Packets = CannedPackets(Rotations)
+
+    def Parse():
+        points = []
+        Rotated = queue.SimpleQueue()
+        for Packet in Packets:
+            points = RealIntegration.ParsePacket(Packet, points, Rotated)
+
+    return [(f"parse/ParsePacket/rotations={Rotations}", Parse)]
+
+
+def Compare(Results, Baseline, Threshold=0.2):
+    """Finds the benchmarks that got slower than the baseline by more than the threshold,
+        and the baseline benchmarks missing from the results, like the ones that failed.
+
+    Args:
+        Results (dict): Results of this run, name to timing.
+        Baseline (dict): Results of the baseline run, only the benchmarks that were run should be in it.
+        Threshold (float, optional): Allowed slowdown, 0.2 is 20%. Defaults to 0.2.
+
+    Returns:
+        list: (name, baseline seconds, seconds) of the regressions, seconds is None for a missing benchmark.
+    """
+    Regressions = []
+    for Name, Before in Baseline.items():
+        if Name not in Results:
+            Regressions.append((Name, Before["min"], None))
+        elif Results[Name]["min"] > Before["min"] * (1 + Threshold):
+            Regressions.append((Name, Before["min"], Results[Name]["min"]))
+    return Regressions
+
+
+def Main(argv=None):
+    """Command line entry point. Runs the benchmarks, writes the results and checks them against a baseline.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to None, sys.argv.
+
+    Returns:
+        int: Exit code, 1 if a benchmark failed or regressed.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scan, processing and parsing paths."
+    )
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("-b", "--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("-t", "--threshold", type=float, default=0.2, help="allowed slowdown")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="runs per benchmark")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks containing this")
+    parser.add_argument("--quick", action="store_true", help="smaller grids")
+    args = parser.parse_args(argv)
+
+    Cases = ScanCases(args.quick) + ProcessingCases(args.quick) + ParsingCases(args.quick)
+    Results = {}
+    Failed = []
+    for Name, Function in Cases:
+        if args.filter not in Name:
+            continue
+        try:
+            Results[Name] = Time(Function, args.repeats)
+        except Exception as error:  # a crashing input is reported, the other benchmarks still run
+            print(f"{Name}: failed with {error!r}", file=sys.stderr)
+            Failed.append(Name)
+            continue
+        print(f"{Name}: {Results[Name]['min'] * 1000:.3f} ms", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as File:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": Results,
+                },
+                File,
+                indent=1,
+            )
+
+    if args.baseline:
+        with open(args.baseline) as File:
+            Baseline = json.load(File)["results"]
+        # the benchmarks left out by --filter are not missing
+        Baseline = {Name: Timing for Name, Timing in Baseline.items() if args.filter in Name}
+        Regressions = Compare(Results, Baseline, args.threshold)
+        for Name, Before, After in Regressions:
+            print(
+                f"REGRESSION {Name}: {Before * 1000:.3f} ms -> "
+                + ("missing" if After is None else f"{After * 1000:.3f} ms"),
+                file=sys.stderr,
+            )
+        if Regressions:
+            return 1
+    return 1 if Failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(Main())
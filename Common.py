@@ -94,7 +94,7 @@ class POIPoint:
         self.color = color
 
     def Canvas(self, canvas, SideSize, GuiScale):
-        """Draws the position on a tkinter canvas.
+        """Draws the position on a tkinter canvas, y up like the scan points.
 
         Args:
             canvas (tkinter.Canvas): Canvas to draw the position on.
@@ -103,9 +103,9 @@ class POIPoint:
         """
         canvas.oval(
             (self.Point.x - 0.1 + SideSize / 2) * GuiScale,
-            (self.Point.y - 0.1 + SideSize / 2) * GuiScale,
+            (self.Point.y * -1 - 0.1 + SideSize / 2) * GuiScale,
             (self.Point.x + 0.1 + SideSize / 2) * GuiScale,
-            (self.Point.y + 0.1 + SideSize / 2) * GuiScale,
+            (self.Point.y * -1 + 0.1 + SideSize / 2) * GuiScale,
             color=self.color,
         )
 
@@ -127,7 +127,7 @@ class Line:
         return f"Line from {self.Point1} to {self.Point2}"
 
     def Canvas(self, canvas, SideSize, GuiScale):
-        """Draws the line on a tkinter canvas.
+        """Draws the line on a tkinter canvas, y up like the scan points.
 
         Args:
             canvas (tkinter.Canvas): Canvas to draw the line on.
@@ -136,14 +136,52 @@ class Line:
         """
         canvas.line(
             (self.Point1.x + SideSize / 2) * GuiScale,
-            (self.Point1.y + SideSize / 2) * GuiScale,
+            (self.Point1.y * -1 + SideSize / 2) * GuiScale,
             (self.Point2.x + SideSize / 2) * GuiScale,
-            (self.Point2.y + SideSize / 2) * GuiScale,
+            (self.Point2.y * -1 + SideSize / 2) * GuiScale,
             width=2,
             color=self.color,
         )
 
 
+class Circle:
+    def __init__(self, Center=Position(), radius=0, residual=0, color="orange"):
+        """Circle class for drawing circles fitted to lidar points, like the rocks. Applicable as a POI.
+
+        Args:
+            Center (Position, optional): Center of the circle. Defaults to Position().
+            radius (float, optional): Radius of the circle. Defaults to 0.
+            residual (float, optional): Root mean square distance of the fitted points from the circle. Defaults to 0.
+            color (str, optional): Color of the circle. Defaults to "orange".
+        """
+        self.Center = Center
+        self.radius = radius
+        self.residual = residual
+        self.color = color
+
+    def __str__(self):
+        return f"Circle at {self.Center} with radius {self.radius} and residual {self.residual}"
+
+    def Canvas(self, canvas, SideSize, GuiScale):
+        """Draws the outline of the circle and its center on a tkinter canvas, y up like the scan points.
+
+        Args:
+            canvas (tkinter.Canvas): Canvas to draw the circle on.
+            SideSize (int): Size of the canvas.
+            GuiScale (int): Scale of the canvas.
+        """
+        for size, color, outline in ((self.radius, None, 2), (0.1, self.color, False)):
+            canvas.oval(
+                (self.Center.x - size + SideSize / 2) * GuiScale,
+                (self.Center.y * -1 - size + SideSize / 2) * GuiScale,
+                (self.Center.x + size + SideSize / 2) * GuiScale,
+                (self.Center.y * -1 + size + SideSize / 2) * GuiScale,
+                color=color,
+                outline=outline,
+                outline_color=self.color,
+            )
+
+
 class Rock:
     def __init__(self, pos=Position(0, 0), diameter=0.5):
         """A rock object that stores its position and diameter.
@@ -173,20 +211,46 @@ class Rock:
         """
         return (pos.x - self.pos.x) ** 2 + (pos.y - self.pos.y) ** 2 < (self.diameter / 2) ** 2
 
+    def RayIntersect(self, origin=Position(0, 0), dx=1, dy=0):
+        """Finds the distance along a ray to the edge of the rock in closed form.
+
+        Args:
+            origin (Position, optional): Start of the ray. Defaults to Position(0,0).
+            dx (float, optional): x component of the unit direction of the ray. Defaults to 1.
+            dy (float, optional): y component of the unit direction of the ray. Defaults to 0.
+
+        Returns:
+            float: Distance to the nearest hit, 0 if the origin is inside the rock, None if the ray misses.
+        """
+        ox = origin.x - self.pos.x
+        oy = origin.y - self.pos.y
+        c = ox**2 + oy**2 - (self.diameter / 2) ** 2
+        if c < 0:  # origin is inside the rock
+            return 0
+        b = ox * dx + oy * dy  # projection of the rock center offset on the ray
+        if b > 0:  # rock is behind the ray
+            return None
+        discriminant = b**2 - c
+        if discriminant < 0:  # ray passes beside the rock
+            return None
+        return -b - math.sqrt(discriminant)
+
 
 class Bot:
-    def __init__(self, pos=Position(0, 0), angle=0, DeadAngles=[]):
+    def __init__(self, pos=Position(0, 0), angle=0, DeadAngles=[], diameter=0):
         """A robot object that stores its position, angle, and dead angles of the lidar.
 
         Args:
             pos (Position, optional): Location of the robot. Defaults to Position(0, 0).
             angle (int, optional): Starting Angle. Defaults to 0.
             DeadAngles (list [[a,b]], optional): Angles the lidar cannot reach because of interference from the bot. Defaults to [[]].
+            diameter (float, optional): Size of the round body the lidars of the other robots see. Defaults to 0, not seen.
         """
 
         self.pos = pos
         self.angle = angle
         self.DeadAngles = DeadAngles
+        self.diameter = diameter
 
     def __str__(self):
         return f"Bot at {self.pos} with angle {self.angle}"
@@ -220,3 +284,37 @@ class Polygon:
 
     def __str__(self):
         return f"Polygon with points {self.points}"
+
+
+class Frame:
+    def __init__(self, FrameID=0, Time=0, AbsoluteLidarData=[], RobotLidarData=[], Scans=None):
+        """One lidar scan as it moves through the scan and processing stages. Not applicable as a POI.
+
+        Args:
+            FrameID (int, optional): Sequence number of the frame, increasing by one per scan. Defaults to 0.
+            Time (float, optional): time.time() when the robot pose of the frame was taken. Defaults to 0.
+            AbsoluteLidarData (list of Positions, optional): Points in the field frame. Defaults to [].
+            RobotLidarData (list of Positions, optional): Points in the robot frame. Defaults to [].
+            Scans (list, optional): [AbsoluteLidarData, RobotLidarData] of every robot, the first robot's are the ones above
+                and the only ones processed. Defaults to None, only the scan above.
+        """
+        self.FrameID = FrameID
+        self.Time = Time
+        self.AbsoluteLidarData = AbsoluteLidarData
+        self.RobotLidarData = RobotLidarData
+        self.Scans = Scans if Scans is not None else [[AbsoluteLidarData, RobotLidarData]]
+
+        # filled in by the processing stage
+        self.AcceptableData = []
+        self.IllegalData = []
+        self.POI = []
+        self.Conflated = 0  # older frames skipped for this one because processing fell behind
+
+        # timings in seconds
+        self.ScanTime = 0  # scanning the frame
+        self.ProcessTime = 0  # processing the frame
+        self.QueuedTime = 0  # time.time() when the frame was queued for processing
+        self.DoneTime = 0  # time.time() when processing finished, minus Time is the frame latency
+
+    def __str__(self):
+        return f"Frame {self.FrameID} with {len(self.RobotLidarData)} points"
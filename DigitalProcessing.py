@@ -1,4 +1,5 @@
-import math, Common, time, copy
+import math, Common, time, itertools
+import numpy
 
 
 class LidarDataProcessor:
@@ -17,6 +18,18 @@ class LidarDataProcessor:
         )  # List of points that are the border of the map, not allowed to be used
         self.POI = []  # List of points of interest, such as rocks, robots, etc.
 
+        # points closer than this to a line through a hull edge are wall points
+        self.WallDistance = 0.15
+        # acceptable points further apart than this are on different arcs, see FindPOI
+        self.ArcGap = 0.5
+        self.MinArcPoints = 4  # fewer points do not tell a circle from noise
+        self.RockRadius = (
+            0.1,
+            2.0,
+        )  # smallest and largest radius of a fitted circle that is a rock
+        self.MaxResidual = 0.1  # root mean square distance of the arc points from a rock circle
+        self.BeginFrame()  # state of the scan given in chunks
+
     def AcceptableProcess(self, NewData=[]):
         if NewData != []:
             self.RobotLidarData = NewData
@@ -93,125 +106,184 @@ class LidarDataProcessor:
             else:
                 self.AcceptableData.extend(ClusteredPoints[i])  # likely not a line\"\"\"
         """
-        HullPoints = self.ConvexHullPoints(self.RobotLidarData)
-
-        m = (HullPoints[0][1].y - HullPoints[0][0].y) / (HullPoints[0][1].x - HullPoints[0][0].x)
-        b = HullPoints[0][0].y - m * HullPoints[0][0].x
-
-        Deviations = [
-            self.DeviationFromLine(
-                self.RobotLidarData,
-                (line[1].y - line[0].y) / (line[1].x - line[0].x),
-                line[0].y - (line[1].y - line[0].y) / (line[1].x - line[0].x) * line[0].x,
-            )
-            for line in HullPoints
-        ]
-
-        CopyRobotLidarData = copy.copy(self.RobotLidarData)
-        j = 0
-        while j < len(Deviations):
-            deviation = Deviations[j]
-            i = 0
-            while i < len(CopyRobotLidarData):
-                # print(deviation[i])
-                if deviation[i] < 0.15:
-                    CopyRobotLidarData.pop(i)
-                    for k in range(len(Deviations)):
-                        Deviations[k].pop(i)
-                else:
-                    i += 1
-            j += 1
-
-        self.AcceptableData = CopyRobotLidarData
-        self.IllegalData = [x for x in self.RobotLidarData if not x in self.AcceptableData]
-
-        # self.IllegalData = SumHallPoints
-        colors = ["red", "orange", "yellow", "green", "blue", "purple"]
+        # the whole scan is one chunk, the wall points are found for all points and hull lines at once
+        Points = self.RobotLidarData
+        self.BeginFrame()
+        self.ProcessChunk(Points)
+        self.FinishFrame()
+
+    def BeginFrame(self):
+        """Starts a scan that arrives in angular chunks, see ProcessChunk and FinishFrame.
+        AcceptableProcess is the same as BeginFrame, ProcessChunk of the whole scan and FinishFrame.
+        """
+        self.RobotLidarData = []
+        self.PointCount = 0
+        # coordinates of the points so far, the buffers grow by doubling
+        self.FrameX = numpy.zeros(0)
+        self.FrameY = numpy.zeros(0)
+        self.WallCount = numpy.zeros(0, dtype=numpy.int32)  # hull lines each point is near
+        self.FrameHull = numpy.zeros(0, dtype=numpy.int64)  # hull vertices of the points so far
+        # (start, end) index pairs of the hull edges, to the first point their counts are for,
+        # each edge has been checked against the points from there to the end of the scan so far
+        self.FrameEdges = {}
+
+    def ProcessChunk(self, Points=[]):
+        """Adds the next chunk of the scan. The hull is updated from its old vertices and the new points,
+            and only the new points are checked against the lines of the hull edges. Removed edges take back the counts
+            of the points they were checked against, the earlier points of the final edges are checked by FinishFrame.
+            So every point is checked against a line at most twice, however small the chunks are.
 
-        for index, line in enumerate(HullPoints):
-            AdjustedLine = copy.copy(line)
-            AdjustedLine[0].y *= -1
-            self.POI.append(Common.Line(line[0], line[1], "blue"))
+        Args:
+            Points (list, optional): Common.Positions of the chunk, in angular order after the earlier chunks. Defaults to [].
+        """
+        start, stop = self.AddPoints(Points)
+        if stop == start:
+            return
 
-    # InverseHullPoints = [x for x in self.RobotLidarData if not x in SumHallPoints]
-    # self.AcceptableData = InverseHullPoints
+        # the old points inside the hull cannot become vertices, only its vertices are kept
+        self.FrameHull = self.ExtendHull(
+            self.FrameX, self.FrameY, self.FrameHull, numpy.arange(start, stop)
+        )
+        Edges = self.HullEdges(self.FrameHull)
+        Kept = set(Edges)
+        self.CountNearLines(
+            {Edge: (First, start) for Edge, First in self.FrameEdges.items() if Edge not in Kept},
+            -1,
+        )
+        # new edges are checked from the first point of this chunk on
+        self.FrameEdges = {Edge: self.FrameEdges.get(Edge, start) for Edge in Edges}
+        self.WallCount[start:stop] += self.NearLineCounts(Edges, start, stop)
 
-    def DetectClusters(self, Points, WindowScale=0.1):
-        """Takes a list of points and returns a list of lists of points that are clustered together.
-            Uses sliding window algorithm to detect clusters.
+    def AddPoints(self, Points):
+        """Adds points to the scan started with BeginFrame and to its coordinate buffers.
 
         Args:
-            Points (Position): List of points to be clustered.
-            WindowScale (float, optional): The scale of the window to be used for clustering. Defaults to 0.1, 10% of the dataset.
+            Points (list): Common.Positions to add.
 
         Returns:
-            List: List of lists of points that are clustered together.
+            Tuple: (start, stop) indices of the added points.
         """
+        start = self.PointCount
+        stop = start + len(Points)
+        if stop > len(self.FrameX):
+            Capacity = max(stop, 2 * len(self.FrameX))
+            self.FrameX, self.FrameY, self.WallCount = [
+                numpy.concatenate((Buffer, numpy.zeros(Capacity - len(Buffer), Buffer.dtype)))
+                for Buffer in (self.FrameX, self.FrameY, self.WallCount)
+            ]
+        self.FrameX[start:stop], self.FrameY[start:stop] = self.PointArrays(Points)
+        self.RobotLidarData.extend(Points)
+        self.PointCount = stop
+        return start, stop
+
+    def FinishFrame(self):
+        """Finishes the scan started with BeginFrame. Points near a line through a hull edge are wall points,
+        the others are acceptable. The lines of the final hull edges are checked against the points before they were added,
+        usually only the edge that closes the hull is left, the rest of the work was done by ProcessChunk.
+        """
+        self.CountNearLines({Edge: (0, First) for Edge, First in self.FrameEdges.items()})
+        self.FrameEdges = dict.fromkeys(self.FrameEdges, 0)
+        Wall = self.WallCount[: self.PointCount] > 0
+        self.AcceptableData = list(itertools.compress(self.RobotLidarData, ~Wall))
+        self.IllegalData = list(itertools.compress(self.RobotLidarData, Wall))
+        self.POI = [
+            Common.Line(self.RobotLidarData[a], self.RobotLidarData[b], "blue")
+            for a, b in self.HullEdges(self.FrameHull)
+        ]
 
-        WindowIndex = 0
-
-        ClusterEndPoints = []
-
-        while WindowIndex + int(len(Points) * WindowScale) < len(Points):
-            Window = Points[
-                WindowIndex : WindowIndex + int(len(Points) * WindowScale)
-            ]  # Get the window of points
-
-            WindowRadii = []
-            for i in range(len(Window) - 1):
-                WindowRadii.append(
-                    math.sqrt(
-                        (Window[i + 1].x - Window[i].x) ** 2 + (Window[i + 1].y - Window[i].y) ** 2
-                    )
-                )  # Get the radii of the window
+    def HullEdges(self, Hull):
+        """Returns the edges of a hull, the last edge closes the hull.
 
-            WindowRadii.append(
-                math.sqrt((Window[0].x - Window[-1].x) ** 2 + (Window[0].y - Window[-1].y) ** 2)
-            )
+        Args:
+            Hull (numpy.ndarray): Indices of the hull vertices in order.
 
-            """WindowRadiiDerivative = []
-            for i in range(len(WindowRadii) - 1):
-                WindowRadiiDerivative.append(
-                    WindowRadii[i + 1] - WindowRadii[i]
-                )  # Get the derivative of the radii
+        Returns:
+            list: (start, end) index pairs, empty for fewer than two vertices.
+        """
+        if len(Hull) < 2:
+            return []
+        Hull = Hull.tolist()
+        return list(zip(Hull, Hull[1:] + Hull[:1]))
 
-            # add the last point to the derivative list
-            WindowRadiiDerivative.append(WindowRadii[0] - WindowRadii[-1])"""
+    def CountNearLines(self, Ranges, Sign=1):
+        """Adds the near line counts of edges over ranges of points to WallCount, the edges with the same range at once.
+            The arithmetic is the same every time, so a negative Sign takes back exactly the counts that were added.
 
-            WindowRadiiDerivative = WindowRadii
+        Args:
+            Ranges (dict): (start, end) index pairs of the edges, to the (start, stop) range of the points to count.
+            Sign (int, optional): 1 to add the counts, -1 to take them back. Defaults to 1.
+        """
+        Groups = {}
+        for Edge, (start, stop) in Ranges.items():
+            if start < stop:
+                Groups.setdefault((start, stop), []).append(Edge)
+        for (start, stop), Edges in Groups.items():
+            self.WallCount[start:stop] += Sign * self.NearLineCounts(Edges, start, stop)
 
-            AbsoluteWindowRadiiDerivative = [
-                abs(derivative) for derivative in WindowRadiiDerivative
-            ]  # Get the absolute value of the derivative
+    def NearLineCounts(self, Edges, start, stop):
+        """Counts the lines through edges that each point of the scan so far is within WallDistance of.
 
-            AbsoluteWindowRadiiDerivativeMean = (
-                self.Mean(AbsoluteWindowRadiiDerivative) * 1.5
-            )  # Get the mean of the absolute value of the derivative
+        Args:
+            Edges (list): (start, end) index pairs of the edges.
+            start (int): First point to count.
+            stop (int): End of the points to count.
 
-            for i in range(len(Window)):
-                if AbsoluteWindowRadiiDerivative[i] > AbsoluteWindowRadiiDerivativeMean:
-                    ClusterEndPoints.append(
-                        WindowIndex + i
-                    )  # If the derivative is greater than the mean, it is likely a cluster end point
+        Returns:
+            numpy.ndarray: Number of near lines of each point from start to stop.
+        """
+        Counts = numpy.zeros(stop - start, dtype=numpy.int32)
+        if not Edges:
+            return Counts
+        a, b = numpy.array(Edges).T
+        StartX, StartY = self.FrameX[a], self.FrameY[a]
+        LineX = self.FrameX[b] - StartX
+        LineY = self.FrameY[b] - StartY
+        Limit = self.WallDistance * numpy.hypot(LineX, LineY)  # distance times the line length
+        BlockSize = max(1, 4_000_000 // len(Edges))  # bound the points x lines distance matrix
+        for block in range(start, stop, BlockSize):
+            X = self.FrameX[block : min(block + BlockSize, stop), None]
+            Y = self.FrameY[block : min(block + BlockSize, stop), None]
+            Near = numpy.abs(LineX * (Y - StartY) - LineY * (X - StartX)) < Limit
+            Counts[block - start : block - start + len(X)] = Near.sum(axis=1)
+        return Counts
 
-            WindowIndex += 1
+    # InverseHullPoints = [x for x in self.RobotLidarData if not x in SumHallPoints]
+    # self.AcceptableData = InverseHullPoints
 
-        ClusterEndPoints = list(set(ClusterEndPoints))  # Remove duplicates
+    def DetectClusters(self, Points, WindowScale=0.1):
+        """Takes a list of points and returns a list of lists of points that are clustered together.
+            The gap from a point to the next one ends a cluster when it is more than 1.5 times the mean gap of a window of gaps around it.
+            The gaps are computed once and the window means with rolling sums, so it runs in linear time.
+            The scan is a circle, the gap from the last point back to the first counts and the windows wrap around.
 
-        Clusters = []
-        for i in range(len(ClusterEndPoints) - 1):
-            Clusters.append(
-                Points[ClusterEndPoints[i] + 1 : ClusterEndPoints[i + 1]]
-            )  # Get the clusters
+        Args:
+            Points (Position): List of points to be clustered, in angular order.
+            WindowScale (float, optional): The scale of the window to be used for clustering. Defaults to 0.1, 10% of the dataset.
 
-        try:
-            if ClusterEndPoints[0] > 2:
-                Clusters.insert(
-                    0, Points[: ClusterEndPoints[0]]
-                )  # Get the first cluster if it exists
-        except IndexError:
-            pass
+        Returns:
+            List: List of lists of points that are clustered together, in angular order. The cluster that wraps around from the last point to the first is the last one.
+        """
+        if len(Points) < 2:
+            return [list(Points)] if len(Points) else []
+        X, Y = self.PointArrays(Points)
+        # Gaps[i] is from point i to the next one
+        Gaps = numpy.hypot(numpy.roll(X, -1) - X, numpy.roll(Y, -1) - Y)
+        Window = min(len(Gaps), max(1, int(len(Gaps) * WindowScale)))
+
+        # mean of the window starting at each gap, from the rolling sum of the gaps around the circle
+        Sums = numpy.concatenate(([0], numpy.cumsum(numpy.concatenate((Gaps, Gaps[: Window - 1])))))
+        Means = (Sums[Window:] - Sums[:-Window]) / Window
+        # a gap is in the windows starting up to Window - 1 gaps before it and ends a cluster
+        # if it stands out in any of them, so it is compared with the lowest of their means
+        Lowest = self.SlidingMinimum(
+            numpy.concatenate((Means[len(Means) - Window + 1 :], Means)), Window
+        )
+        Ends = numpy.flatnonzero(Gaps > Lowest * 1.5).tolist()
+        if not Ends:
+            return [list(Points)]
 
+        Clusters = [Points[a + 1 : b + 1] for a, b in zip(Ends, Ends[1:])]
+        Clusters.append(list(Points[Ends[-1] + 1 :]) + list(Points[: Ends[0] + 1]))
         return Clusters
 
     def LinearRegression(self, Points):
@@ -269,6 +341,26 @@ class LidarDataProcessor:
         else:
             return nums[len(nums) // 2]
 
+    def SlidingMinimum(self, Values, Window):
+        """Returns the minimum of every run of Window consecutive values in linear time,
+            from the running minimums forward and backward through blocks of Window values.
+
+        Args:
+            Values (numpy.ndarray): Values to take the minimums of.
+            Window (int): Number of consecutive values in each minimum.
+
+        Returns:
+            numpy.ndarray: Minimum of Values[i : i + Window] for each i, len(Values) - Window + 1 of them.
+        """
+        Count = len(Values) - Window + 1
+        Blocks = numpy.full(-(-len(Values) // Window) * Window, numpy.inf)
+        Blocks[: len(Values)] = Values
+        Blocks = Blocks.reshape(-1, Window)
+        Forward = numpy.minimum.accumulate(Blocks, axis=1).ravel()
+        Backward = numpy.minimum.accumulate(Blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+        # a run starts in one block and ends in the same or the next one
+        return numpy.minimum(Backward[:Count], Forward[Window - 1 : Window - 1 + Count])
+
     def StandardDeviation(self, nums):
         """Returns the standard deviation of a list of numbers.
 
@@ -334,138 +426,236 @@ class LidarDataProcessor:
         )
         return R
 
-    def FindPOI(self):
-        pass  # TODO: Find points of interest, such as rocks.
+    def FindPOI(self, Points=None):
+        """Finds the rocks among the acceptable points and adds them to the POI as circles.
+            The points are split into arcs and a circle is fitted to every arc at once, see ArcLabels and FitCircles,
+            so the work is a few array operations however many arcs there are.
+            A circle is a rock if its radius is in RockRadius, its residual is at most MaxResidual
+            and its center is behind the arc, the lidar only sees the near side of a rock.
 
-    def ConvexHullPoints(self, Points=[]):
-        """Returns the points that make up the convex hull of a set of points.
+        Args:
+            Points (list, optional): Common.Positions in angular order. Defaults to None, the AcceptableData.
+
+        Returns:
+            list: Common.Circles of the rocks found, they replace the Common.Circles in the POI.
+        """
+        Points = self.AcceptableData if Points is None else Points
+        # the rocks of an earlier call are replaced, so running it again on the same frame changes nothing
+        self.POI = [Interest for Interest in self.POI if not isinstance(Interest, Common.Circle)]
+        if len(Points) < self.MinArcPoints:
+            return []
+        X, Y = self.PointArrays(Points)
+        Labels = self.ArcLabels(X, Y)
+        CenterX, CenterY, Radius, Residual, Count = self.FitCircles(X, Y, Labels)
+        Range = numpy.bincount(Labels, numpy.hypot(X, Y), len(Count)) / numpy.maximum(Count, 1)
+
+        # degenerate fits have nan radii, every comparison with them is false
+        Rock = numpy.flatnonzero(
+            (Count >= self.MinArcPoints)
+            & (Radius >= self.RockRadius[0])
+            & (Radius <= self.RockRadius[1])
+            & (Residual <= self.MaxResidual)
+            & (numpy.hypot(CenterX, CenterY) > Range)
+        )
+        Rocks = [
+            Common.Circle(Common.Position(x, y), radius, residual)
+            for x, y, radius, residual in zip(
+                CenterX[Rock].tolist(),
+                CenterY[Rock].tolist(),
+                Radius[Rock].tolist(),
+                Residual[Rock].tolist(),
+            )
+        ]
+        self.POI.extend(Rocks)
+        return Rocks
+
+    def ArcLabels(self, X, Y):
+        """Splits points in angular order into arcs at the gaps wider than ArcGap.
+            The scan is a circle, the arc that wraps around from the last point to the first is one arc.
 
         Args:
-            Points (list, optional): List of Common.Positions. Defaults to [].
+            X (numpy.ndarray): x coordinates of the points.
+            Y (numpy.ndarray): y coordinates of the points.
 
         Returns:
-            list: List of Common.Positions that make up the convex hull.
-        """
-
-        def FurthestPointCalc(Points, LinePointOne, LinePointTwo):
-            FurthestPoint = copy.copy(Points[0])
-            m = (LinePointTwo.y - LinePointOne.y) / (LinePointTwo.x - LinePointOne.x)
-            b = LinePointOne.y - m * LinePointOne.x
-            FurthestPointDeviation = self.DeviationFromLine([FurthestPoint], m, b)[0]
-            for point in Points:
-                Deviation = self.DeviationFromLine([point], m, b)[0]
-                if Deviation > FurthestPointDeviation:
-                    FurthestPoint = copy.copy(point)
-                    FurthestPointDeviation = Deviation
-            return FurthestPoint
-
-        def ExtrapolateHull(Points, LinePointOne, LinePointTwo):
-            # print(len(Points))
-            if len(Points) == 0:  # no points left to extrapolate, return hull polygon section
-                return [[LinePointOne, LinePointTwo]]
-            FurthestPoint = FurthestPointCalc(Points, LinePointOne, LinePointTwo)
-            # print(FurthestPoint)
-            NewPoints = []
-            for point in Points:
-                if (
-                    not point == FurthestPoint
-                    and not point == LinePointOne
-                    and not point == LinePointTwo
-                ):
-                    if LinePointOne.y == LinePointTwo.y:
-                        # horizontal bottom, don't include bottom points in raycast
-                        if not self.RayCastIntersectContains(
-                            [[LinePointOne, FurthestPoint], [FurthestPoint, LinePointTwo]], point
-                        ):
-                            NewPoints.append(copy.copy(point))
-                    else:
-                        # slanted bottom, include bottom points in raycast
-                        if not self.RayCastIntersectContains(
-                            [
-                                [LinePointOne, FurthestPoint],
-                                [FurthestPoint, LinePointTwo],
-                                [LinePointTwo, LinePointOne],
-                            ],
-                            point,
-                        ):
-                            NewPoints.append(copy.copy(point))
-
-            m = (FurthestPoint.y - LinePointOne.y) / (FurthestPoint.x - LinePointOne.x)
-            b = LinePointOne.y - m * LinePointOne.x
-
-            FilteredNewPoints = [
-                point
-                for point in NewPoints
-                if point.x < FurthestPoint.x and point.y > m * point.x + b
-            ]
-            InverseFilteredNewPoints = [
-                point
-                for point in NewPoints
-                if point.x > FurthestPoint.x and point.y < m * point.x + b
-            ]
+            numpy.ndarray: Arc number of each point, not every number below the largest one has to be used.
+        """
+        # Breaks[i] is the gap from point i to the next one
+        Breaks = numpy.hypot(numpy.roll(X, -1) - X, numpy.roll(Y, -1) - Y) > self.ArcGap
+        Labels = numpy.concatenate(([0], numpy.cumsum(Breaks[:-1])))
+        if Breaks.any() and not Breaks[-1]:
+            Labels[Labels == Labels[-1]] = 0  # the last arc goes on with the first
+        return Labels
+
+    def FitCircles(self, X, Y, Labels):
+        """Fits a circle to the points of every label at once with the algebraic (Kasa) least squares fit,
+            x^2 + y^2 + D x + E y + F = 0. The sums of the normal equations of all labels come from numpy.bincount.
+            The points are centered on the mean of their label first, which keeps the sums well conditioned
+            and splits the normal equations into F = -mean(x^2 + y^2) and a 2x2 system for D and E,
+            solved for all labels in closed form.
 
-            x = ExtrapolateHull(FilteredNewPoints, LinePointOne, FurthestPoint)
-            # print("x " + str(x))
-            y = ExtrapolateHull(InverseFilteredNewPoints, FurthestPoint, LinePointTwo)
-            # print("y " + str(y))
-            # print("furthest pint: " + str(FurthestPoint) + " x: " + str(x) + " y: " + str(y))
+        Args:
+            X (numpy.ndarray): x coordinates of the points.
+            Y (numpy.ndarray): y coordinates of the points.
+            Labels (numpy.ndarray): Non negative label of each point, see ArcLabels.
 
-            x.extend(y)  # combine the two lists of polygon sections
-            return x
+        Returns:
+            Tuple: (CenterX, CenterY, Radius, Residual, Count) arrays indexed by label. Residual is the root mean square
+                distance of the points from the circle, labels with collinear or fewer than three points have nan circles.
+        """
+        Count = numpy.bincount(Labels)
+        Safe = numpy.maximum(Count, 1)
+        MeanX = numpy.bincount(Labels, X) / Safe
+        MeanY = numpy.bincount(Labels, Y) / Safe
+        U = X - MeanX[Labels]
+        V = Y - MeanY[Labels]
+        Z = U * U + V * V
+        Suu, Suv, Svv, Suz, Svz, Sz = [
+            numpy.bincount(Labels, Weights, len(Count))
+            for Weights in (U * U, U * V, V * V, U * Z, V * Z, Z)
+        ]
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            Det = Suu * Svv - Suv * Suv
+            Det[Count < 3] = 0  # two points are on every circle through them
+            D = (Suv * Svz - Svv * Suz) / Det
+            E = (Suv * Suz - Suu * Svz) / Det
+            Radius = numpy.sqrt((D * D + E * E) / 4 + Sz / Safe)
+            Distance = numpy.hypot(U + D[Labels] / 2, V + E[Labels] / 2) - Radius[Labels]
+            Residual = numpy.sqrt(numpy.bincount(Labels, Distance * Distance, len(Count)) / Safe)
+        return MeanX - D / 2, MeanY - E / 2, Radius, Residual, Count
 
-        LeftMostPoint = copy.copy(Points[0])
-        for point in Points:
-            if point.x < LeftMostPoint.x:
-                LeftMostPoint = copy.copy(point)
-            elif point.x == LeftMostPoint.x and point.y < LeftMostPoint.y:
-                LeftMostPoint = copy.copy(point)
+    def PointArrays(self, Points):
+        """Converts a list of points to coordinate arrays for the array based steps.
 
-        RightMostPoint = copy.copy(Points[0])
-        for point in Points:
-            if point.x > RightMostPoint.x:
-                RightMostPoint = copy.copy(point)
-            elif point.x == RightMostPoint.x and point.y > RightMostPoint.y:
-                RightMostPoint = copy.copy(point)
+        Args:
+            Points (list): List of Common.Positions.
 
-        # print(LeftMostPoint)
-        # print(RightMostPoint)
+        Returns:
+            Tuple: (X, Y) numpy arrays.
+        """
+        return (
+            numpy.fromiter((point.x for point in Points), dtype=numpy.float64, count=len(Points)),
+            numpy.fromiter((point.y for point in Points), dtype=numpy.float64, count=len(Points)),
+        )
 
-        # Upper
-        m = (RightMostPoint.y - LeftMostPoint.y) / (RightMostPoint.x - LeftMostPoint.x)
-        b = LeftMostPoint.y - m * LeftMostPoint.x
-        UpperPoints = [copy.copy(point) for point in Points if point.y > m * point.x + b]
-        LowerPoints = [copy.copy(point) for point in Points if point.y < m * point.x + b]
+    def ConvexHullIndices(self, X, Y):
+        """Finds the convex hull of points given as arrays with the monotone chain algorithm.
+            The points are sorted once and each chain is pruned with array passes, see ConvexChain,
+            so it runs in O(n log n) also when most points are on the hull, like the ring of a lidar scan.
+            Only cross products are used, so vertical edges, collinear points and duplicates need no special cases.
 
-        # print(UpperPoints)
-        # print(LowerPoints)
+        Args:
+            X (numpy.ndarray): x coordinates of the points.
+            Y (numpy.ndarray): y coordinates of the points.
 
-        UpperHull = ExtrapolateHull(UpperPoints, LeftMostPoint, RightMostPoint)
-        LowerHull = ExtrapolateHull(LowerPoints, RightMostPoint, LeftMostPoint)
+        Returns:
+            numpy.ndarray: Indices of the hull vertices in counterclockwise order, starting at the lowest leftmost point.
+                Points on a hull edge are not vertices, all collinear points give the two end points.
+        """
+        X = numpy.asarray(X, dtype=numpy.float64)
+        Y = numpy.asarray(Y, dtype=numpy.float64)
+        if len(X) == 0:
+            return numpy.zeros(0, dtype=numpy.int64)
+        # sorted by x then y, of duplicate points only the first index is kept
+        Order = numpy.lexsort((Y, X))
+        Distinct = numpy.concatenate(
+            ([True], (numpy.diff(X[Order]) != 0) | (numpy.diff(Y[Order]) != 0))
+        )
+        Order = Order[Distinct]
+        Left, Right = (
+            Order[0],
+            Order[-1],
+        )  # lowest of the leftmost and highest of the rightmost points
+        if len(Order) == 1:  # every point is the same point
+            return Order.astype(numpy.int64)
+
+        # the lower chain is on and below the line from Left to Right, the upper chain on and above it
+        Side = (X[Right] - X[Left]) * (Y[Order] - Y[Left]) - (Y[Right] - Y[Left]) * (
+            X[Order] - X[Left]
+        )
+        Lower = self.ConvexChain(X, Y, Order[Side <= 0])
+        Upper = self.ConvexChain(X, Y, Order[Side >= 0][::-1])
+        return numpy.concatenate((Lower[:-1], Upper[:-1])).astype(numpy.int64)
 
-        # print("upper hull: " + str(UpperHull))
-        # print("lower hull: " + str(LowerHull))
+    def ConvexChain(self, X, Y, Chain):
+        """Keeps the points of a sorted chain that are strict left turns, one half of the monotone chain hull.
+            A point that is not a left turn from the points before and after it is not a hull vertex, so every pass
+            drops all of them at once. Passes that leave points to drop are bounded by the log of the chain length,
+            what is left is finished with the usual stack of the monotone chain algorithm.
 
-        LowerHull[-1][1] = UpperHull[-1][0]
-        LowerHull[0][0] = UpperHull[0][1]
+        Args:
+            X (numpy.ndarray): x coordinates of the points.
+            Y (numpy.ndarray): y coordinates of the points.
+            Chain (numpy.ndarray): Indices of distinct points in the order of the chain, from the first to the last hull vertex.
 
-        UpperHull.extend(LowerHull)
+        Returns:
+            numpy.ndarray: Indices of the vertices of the chain, with its first and last point.
+        """
+        for Pass in range(int(math.log2(len(Chain) + 1)) + 1):
+            if len(Chain) < 3:
+                return Chain
+            a, b, c = Chain[:-2], Chain[1:-1], Chain[2:]
+            Turn = (X[b] - X[a]) * (Y[c] - Y[a]) - (Y[b] - Y[a]) * (X[c] - X[a]) > 0
+            if Turn.all():
+                return Chain
+            Chain = Chain[numpy.concatenate(([True], Turn, [True]))]
+
+        Stack = []  # (index, x, y) of the vertices so far
+        for Point in zip(Chain.tolist(), X[Chain].tolist(), Y[Chain].tolist()):
+            while (
+                len(Stack) >= 2
+                and (Stack[-1][1] - Stack[-2][1]) * (Point[2] - Stack[-2][2])
+                - (Stack[-1][2] - Stack[-2][2]) * (Point[1] - Stack[-2][1])
+                <= 0
+            ):
+                Stack.pop()
+            Stack.append(Point)
+        return numpy.array([Point[0] for Point in Stack], dtype=Chain.dtype)
 
-        # for line in UpperHull:  # mirror the hull over the y axis
-        # line[0].x *= -1
-        # line[1].x *= -1
+    def ExtendHull(self, X, Y, Hull, New):
+        """Adds points to a convex hull. The old points inside the hull cannot be vertices of the new one,
+            so the new hull is the hull of the old vertices and the new points, O(m log m) in their number m.
 
-        """i = 0
-        while i < len(UpperHull) - 1:
-            if UpperHull[i][0] == UpperHull[i + 1][1] and UpperHull[i][1] == UpperHull[i + 1][0]:
-                UpperHull.pop(i)  # inverse lines, remove one
-                UpperHull[i - 1][1] = UpperHull[i][0]  # combine the two lines
+        Args:
+            X (numpy.ndarray): x coordinates of all points.
+            Y (numpy.ndarray): y coordinates of all points.
+            Hull (numpy.ndarray): Indices of the hull vertices of the old points, counterclockwise, see ConvexHullIndices.
+            New (numpy.ndarray): Indices of the new points.
 
-            i += 1"""
+        Returns:
+            numpy.ndarray: Indices of the hull vertices of the old and new points, counterclockwise.
+        """
+        Candidates = numpy.concatenate((Hull, New))
+        return Candidates[self.ConvexHullIndices(X[Candidates], Y[Candidates])]
 
-        # for line in LowerHull:
-        # print("[" + str(line[0]) + ", " + str(line[1]) + "],")
+    def ConvexHull(self, Points=[]):
+        """Returns the vertices of the convex hull of a set of points, see ConvexHullIndices.
 
-        return UpperHull
+        Args:
+            Points (list, optional): List of Common.Positions. Defaults to [].
+
+        Returns:
+            list: The Common.Positions that are hull vertices, in counterclockwise order.
+        """
+        return [
+            Points[index] for index in self.ConvexHullIndices(*self.PointArrays(Points)).tolist()
+        ]
+
+    def ConvexHullPoints(self, Points=[]):
+        """Returns the edges that make up the convex hull of a set of points.
+
+        Args:
+            Points (list, optional): List of Common.Positions. Defaults to [].
+
+        Returns:
+            list: List of [Common.Position, Common.Position] edges between consecutive hull vertices, counterclockwise.
+                Empty for fewer than two distinct points.
+        """
+        Hull = self.ConvexHull(Points)
+        if len(Hull) < 2:
+            return []
+        return [[Hull[i], Hull[(i + 1) % len(Hull)]] for i in range(len(Hull))]
 
     def RayCastIntersectContains(self, polygon=[[]], point=Common.Position()):
         """Returns whether or not a point is inside a polygon.
@@ -504,3 +694,152 @@ class LidarDataProcessor:
         return (
             intersectionCount % 2 == 1
         )  # odd number of intersections means the point is inside the polygon
+
+
+class LineWallProcessor(LidarDataProcessor):
+    def __init__(
+        self,
+        Hypotheses=256,
+        MinPoints=8,
+        MinLength=2.0,
+        MaxGap=1.0,
+        MinPiece=2,
+        MaxLines=16,
+        TimeBudget=0.01,
+        Seed=0,
+    ):
+        """Wall removal that fits lines to the scan with RANSAC instead of taking the convex hull,
+            so walls of non convex rooms and walls hidden behind others are found too.
+            Takes the scan whole or in chunks like LidarDataProcessor, the lines are fitted in FinishFrame.
+
+        Args:
+            Hypotheses (int, optional): Lines through two sampled points scored against the scan at once. Defaults to 256.
+            MinPoints (int, optional): Points a wall segment needs. Defaults to 8.
+            MinLength (float, optional): Length a wall segment needs, shorter straight runs like rock edges are kept. Defaults to 2.0.
+            MaxGap (float, optional): Gap along a line that splits it into separate segments. Defaults to 1.0.
+            MinPiece (int, optional): Points the other segments of a wall line need, the pieces of the wall seen between obstacles. Defaults to 2.
+            MaxLines (int, optional): Most lines fitted per scan. Defaults to 16.
+            TimeBudget (float, optional): Seconds per scan after which no more lines are fitted. Defaults to 0.01.
+            Seed (int, optional): Seed of the point sampling, the same scan gives the same walls. Defaults to 0.
+        """
+        super().__init__()
+        self.Hypotheses = Hypotheses
+        self.MinPoints = MinPoints
+        self.MinLength = MinLength
+        self.MaxGap = MaxGap
+        self.MaxLines = MaxLines
+        self.TimeBudget = TimeBudget
+        self.Seed = Seed
+        self.MinPiece = MinPiece
+
+    def ProcessChunk(self, Points=[]):
+        """Adds the next chunk of the scan, the lines need the whole scan so they are fitted in FinishFrame.
+
+        Args:
+            Points (list, optional): Common.Positions of the chunk, in angular order after the earlier chunks. Defaults to [].
+        """
+        self.AddPoints(Points)
+
+    def FinishFrame(self):
+        """Fits the wall lines to the scan started with BeginFrame. Points of wall segments are wall points,
+        the others are acceptable. The wall segments are the POI.
+        """
+        X = self.FrameX[: self.PointCount]
+        Y = self.FrameY[: self.PointCount]
+        Wall, Segments = self.ExtractLines(X, Y)
+        self.AcceptableData = list(itertools.compress(self.RobotLidarData, ~Wall))
+        self.IllegalData = list(itertools.compress(self.RobotLidarData, Wall))
+        self.POI = [
+            Common.Line(Common.Position(*Start), Common.Position(*End), "blue")
+            for Start, End in Segments
+        ]
+
+    def ExtractLines(self, X, Y):
+        """Finds the wall segments of a scan with RANSAC. All hypotheses are scored against all points as one array,
+            then the best line is refit to its inliers and split at gaps. If one of its segments is long enough it is a wall
+            and its segments are taken out of the scan.
+            The scores of the other hypotheses are updated for the removed points and the next best line is taken,
+            until MaxLines, the time budget or no line with MinPoints is left.
+
+        Args:
+            X (numpy.ndarray): x coordinates of the scan, in angular order.
+            Y (numpy.ndarray): y coordinates of the scan, in angular order.
+
+        Returns:
+            Tuple: (Wall, Segments) boolean array of the wall points and a list of ((x, y), (x, y)) segment end points.
+        """
+        start = time.perf_counter()
+        Wall = numpy.zeros(len(X), dtype=bool)
+        Segments = []
+        if len(X) < self.MinPoints:
+            return Wall, Segments
+
+        # lines through pairs of points a few degrees of scan apart, likely on the same wall
+        Generator = numpy.random.default_rng(self.Seed)
+        Count = max(1, min(self.Hypotheses, 4_000_000 // len(X)))  # bound the lines x points array
+        First = Generator.integers(0, len(X), Count)
+        Second = (First + Generator.integers(len(X) // 90 + 1, len(X) // 16 + 2, Count)) % len(X)
+        StartX, StartY = X[First, None], Y[First, None]
+        LineX = X[Second, None] - StartX
+        LineY = Y[Second, None] - StartY
+        Limit = self.WallDistance * numpy.hypot(LineX, LineY)  # distance times the line length
+        Inliers = numpy.abs(LineX * (Y - StartY) - LineY * (X - StartX)) < Limit
+        Inliers &= Limit > 0  # a pair of equal points is no line
+        Scores = Inliers.sum(axis=1)
+
+        Remaining = numpy.ones(len(X), dtype=bool)
+        Lines = 0
+        Tried = 0
+        while Lines < self.MaxLines and Tried < Count:
+            if time.perf_counter() - start > self.TimeBudget:
+                break
+            Best = int(numpy.argmax(Scores))
+            if Scores[Best] < self.MinPoints:
+                break
+            Tried += 1
+
+            # refit the line to the inliers by total least squares, then take its inliers again
+            Members = numpy.flatnonzero(Inliers[Best] & Remaining)
+            CenterX, CenterY = X[Members].mean(), Y[Members].mean()
+            Direction = numpy.linalg.svd(
+                numpy.stack((X[Members] - CenterX, Y[Members] - CenterY), axis=1),
+                full_matrices=False,
+            )[2][0]
+            Candidates = numpy.flatnonzero(Remaining)
+            OffsetX, OffsetY = X[Candidates] - CenterX, Y[Candidates] - CenterY
+            Near = numpy.abs(Direction[0] * OffsetY - Direction[1] * OffsetX) < self.WallDistance
+            Candidates = Candidates[Near]
+            Along = (Direction[0] * OffsetX + Direction[1] * OffsetY)[Near]
+
+            # split the inliers at gaps into segments
+            Order = numpy.argsort(Along)
+            Along, Candidates = Along[Order], Candidates[Order]
+            Splits = numpy.flatnonzero(numpy.diff(Along) > self.MaxGap) + 1
+            Pieces = list(zip([0, *Splits.tolist()], [*Splits.tolist(), len(Along)]))
+            Taken = []
+            # a line with a long segment is a wall, its shorter pieces seen between obstacles too
+            if any(
+                b - a >= self.MinPoints and Along[b - 1] - Along[a] >= self.MinLength
+                for a, b in Pieces
+            ):
+                for a, b in Pieces:
+                    if b - a >= self.MinPiece:
+                        Taken.append(Candidates[a:b])
+                        Segments.append(
+                            tuple(
+                                (CenterX + Direction[0] * t, CenterY + Direction[1] * t)
+                                for t in (float(Along[a]), float(Along[b - 1]))
+                            )
+                        )
+            if not Taken:  # no wall on this line, drop the hypotheses through two of its points
+                OnLine = numpy.zeros(len(X), dtype=bool)
+                OnLine[Candidates] = True
+                Scores[OnLine[First] & OnLine[Second]] = 0
+                Scores[Best] = 0
+                continue
+            Lines += 1
+            Taken = numpy.concatenate(Taken)
+            Wall[Taken] = True
+            Remaining[Taken] = False
+            Scores -= Inliers[:, Taken].sum(axis=1)
+        return Wall, Segments
@@ -1,5 +1,11 @@
-import Common, random, math, threading
-import guizero
+import Common, SpatialIndex, Noise, random, math, threading
+import numpy
+
+# hit types of the ground truth labels, see HitLabels
+HIT_NONE = -1  # ray in a dead angle
+HIT_BORDER = 0
+HIT_ROCK = 1
+HIT_ROBOT = 2
 
 
 class Environment:
@@ -11,6 +17,7 @@ class Environment:
         RockCount=5,
         RockDiameter=0,
         RobotDeadAngles=[],
+        RobotDiameter=0,
     ):
         """The environment object that stores the size of the environment, the robot, and the rocks.
         Args:
@@ -20,9 +27,13 @@ class Environment:
             RockCount (int, optional): number of rocks on the environment. Defaults to 5.
             RockDiameter (float, optional): Size of the rocks. Defaults to random(0-1).
             RobotDeadAngles (list [[a,b]], optional): Angles the lidar cannot reach because of interference from the bot. Defaults to [[]].
+            RobotDiameter (float, optional): Size of the robot's body as the other robots see it. Defaults to 0.
         """
         self.SideSize = SideSize
-        self.Robot = Common.Bot(RobotPos, RobotAngle, RobotDeadAngles)
+        self.Robot = Common.Bot(RobotPos, RobotAngle, RobotDeadAngles, RobotDiameter)
+        self.Robots = [
+            self.Robot
+        ]  # every robot with a lidar, Robot is the one the scans are taken from
         self.Rocks = [
             Common.Rock(
                 Common.Position(
@@ -33,6 +44,9 @@ class Environment:
             )
             for i in range(RockCount)
         ]  # List of rocks at random locations made with list comprehension
+        self.RockIndex = SpatialIndex.RockGrid(self.Rocks)  # grid for ray queries against the rocks
+        self.SceneVersion = 0  # bumped whenever the rocks change, see SharedScene
+        self.RockArrayCache = None  # (scene version, rock arrays)
 
     def __str__(self):
         return f"Environment with size {self.SideSize} and {len(self.Rocks)} rocks"
@@ -55,39 +69,144 @@ class Environment:
         self.Robot.pos = pos
         self.Robot.angle = angle
 
-    def ScanLidar(self, PointCount=365, accuracy=0.001, randomize=0.01, StartStopAngle=[]):
+    def AddRobot(self, robot):
+        """Add a robot with its own lidar to the environment. Robots with a diameter block the lidars of the others.
+
+        Args:
+            robot (Common.Bot): Robot to add.
+
+        Returns:
+            int: Index of the robot in Robots, the index to pass to SelectRobot.
+        """
+        self.Robots.append(robot)
+        return len(self.Robots) - 1
+
+    def SelectRobot(self, index):
+        """Makes a robot the one the scans are taken from. The other robots become obstacles for its lidar.
+
+        Args:
+            index (int): Index of the robot in Robots.
+
+        Returns:
+            Common.Bot: The selected robot.
+        """
+        self.Robot = self.Robots[index]
+        return self.Robot
+
+    def OtherRobots(self):
+        """Returns the indices of the robots that are obstacles to the selected robot's lidar.
+
+        Returns:
+            list: Indices in Robots of the other robots with a diameter.
+        """
+        return [
+            index
+            for index, robot in enumerate(self.Robots)
+            if robot is not self.Robot and robot.diameter > 0
+        ]
+
+    def RobotBodies(self):
+        """Returns the bodies of the robots other than the selected one as rocks, the obstacles they are to its lidar.
+
+        Returns:
+            list: List of Common.Rocks in the order of OtherRobots, empty for a single robot.
+        """
+        return [
+            Common.Rock(self.Robots[index].pos, self.Robots[index].diameter)
+            for index in self.OtherRobots()
+        ]
+
+    def AddRock(self, rock):
+        """Add a rock to the environment and the rock index.
+
+        Args:
+            rock (Common.Rock): Rock to add.
+        """
+        self.UpdateRockIndex()
+        self.RockIndex.Add(rock)
+        self.SceneVersion += 1
+
+    def MoveRock(self, index, pos):
+        """Move a rock and update the rock index.
+
+        Args:
+            index (int): Index of the rock in Rocks.
+            pos (Position): New position of the rock.
+        """
+        self.UpdateRockIndex()
+        self.RockIndex.Move(index, pos)
+        self.SceneVersion += 1
+
+    def RemoveRock(self, index):
+        """Remove a rock from the environment and rebuild the rock index.
+
+        Args:
+            index (int): Index of the rock in Rocks.
+        """
+        self.Rocks.pop(index)
+        self.RockIndex.Build()
+        self.SceneVersion += 1
+
+    def UpdateRockIndex(self):
+        """Rebuild the rock index if Rocks was replaced or resized without the rock functions above."""
+        if self.RockIndex.Rocks is not self.Rocks:
+            self.RockIndex = SpatialIndex.RockGrid(self.Rocks)
+            self.SceneVersion += 1
+        elif self.RockIndex.Count != len(self.Rocks):
+            self.RockIndex.Build()
+            self.SceneVersion += 1
+
+    def ScanLidar(
+        self, PointCount=365, accuracy=0.001, randomize=0.01, StartStopAngle=[], noise=None
+    ):
         """Scan the lidar of the robot.
 
         Args:
             PointCount (int, optional): How many points to scan. Defaults to 365.
             accuracy (float, optional): How small scan iterations are. Defaults to 0.001.
             randomize (float, positive float): How much to randomize the scan. Defaults to 0.01.
+            StartStopAngle (list [a,b], optional): Angle range to scan. Defaults to [], the full circle.
+            noise (Noise.NoiseModel, optional): Noise model applied to the whole scan at once. Defaults to None, DefaultNoise.
 
         Returns:
             list: List of the Points scanned, Position Objects.
         """
+        return self.NoisyPoints(
+            *self.MarchReturns(PointCount, accuracy, StartStopAngle), randomize, noise
+        )
 
-        points = []
+    def MarchReturns(self, PointCount=365, accuracy=0.001, StartStopAngle=[]):
+        """Steps every ray forward until it enters a rock or leaves the environment, without noise.
 
-        for i in range(PointCount):  # for each point
-            if StartStopAngle == []:  # if no start and stop angle
-                angle = i / PointCount * 2 * math.pi  # angle is proportion of 2pi times point count
-            else:
-                angle = StartStopAngle[0] + i / PointCount * (
-                    StartStopAngle[1] - StartStopAngle[0]
-                )  # angle is proportion of start and stop angle times point count
+        Args:
+            PointCount (int, optional): How many points to scan. Defaults to 365.
+            accuracy (float, optional): How small scan iterations are. Defaults to 0.001.
+            StartStopAngle (list [a,b], optional): Angle range to scan. Defaults to [], the full circle.
+
+        Returns:
+            Tuple: (HitX, HitY, Ranges) lists of the ray direction and exact range of each return.
+        """
+
+        HitX, HitY, Ranges = (
+            [],
+            [],
+            [],
+        )  # direction and exact range of each return, noise is added at the end
+        self.UpdateRockIndex()
+
+        Plan = GetRayPlan(PointCount, StartStopAngle, self.Robot.DeadAngles)
+        RayX, RayY = Plan.Rotate(self.Robot.angle)  # ray directions for the robot's current angle
+        Bodies = self.RobotBodies()  # the other robots are checked at every step like nearby rocks
 
-            if self.Robot.IsDead(angle):  # if angle is in dead angle, skip
+        for dx, dy, valid in zip(RayX.tolist(), RayY.tolist(), Plan.ValidList):  # for each point
+            if not valid:  # if angle is in dead angle, skip
                 continue
 
             for rock in self.Rocks:  # for each rock
                 if rock.IsIn(self.Robot.pos):  # if ray is in rock
-                    points.append(
-                        Common.Position(
-                            self.Robot.pos.x + random.random() * randomize,
-                            self.Robot.pos.y + random.random() * randomize,
-                        )
-                    )  # add point to list with random noise added. This noise is controllable by the initialization variables.
+                    HitX.append(dx)
+                    HitY.append(dy)
+                    Ranges.append(0)  # the point is at the robot position
                     continue
 
             RayPosition = Common.Position(
@@ -104,10 +223,12 @@ class Environment:
                     RayPosition.y + math.sin(angle) * accuracy * 10,
                 )  # move ray forward at angle by accuracy * 10 amount"""
 
-                RayPosition.x += math.cos(angle) * accuracy * 10
-                RayPosition.y += math.sin(angle) * accuracy * 10
+                RayPosition.x += dx * accuracy * 10
+                RayPosition.y += dy * accuracy * 10
 
-                for rock in self.Rocks:  # for each rock
+                for rock in (
+                    self.RockIndex.RocksNear(RayPosition) + Bodies
+                ):  # for each rock near the ray
                     if rock.IsIn(RayPosition):  # if ray is in rock
                         InRock = True  # break loop on next iteration
                         while rock.IsIn(RayPosition):  # while ray is in rock
@@ -116,36 +237,503 @@ class Environment:
                                 RayPosition.y - math.sin(angle) * accuracy,
                             )  # move ray backwards by accuracy amount until it is just out of the rock
                             """
-                            RayPosition.x -= math.cos(angle) * accuracy
-                            RayPosition.y -= math.sin(angle) * accuracy
+                            RayPosition.x -= dx * accuracy
+                            RayPosition.y -= dy * accuracy
                             # edge finding
                         break
 
-                if random.random() > 0.99999:  # add random noise
-                    # if this is triggered the point is added to the list at its current position
-                    # this simulates extreme random noise as points can appear anywhere on the ray length.
-                    # break
-                    pass
-
-            if not InRock:  # if ray is not in rock, it hit the border of the environment
-                # find if the ray hit the border on the x or y axis and move it to the border exactly
-                if abs(RayPosition.x) > self.SideSize / 2:
-                    RayPosition = Common.Position(
-                        self.SideSize / 2 * math.copysign(1, RayPosition.x), RayPosition.y
-                    )  # if the abs(x) is greater than the side size, move it to the side size (with sign)
-                if abs(RayPosition.y) > self.SideSize / 2:
-                    RayPosition = Common.Position(
-                        RayPosition.x, self.SideSize / 2 * math.copysign(1, RayPosition.y)
-                    )  # if the abs(y) is greater than the side size, move it to the side size (with sign)
-
-            points.append(
-                Common.Position(
-                    RayPosition.x + random.random() * randomize,
-                    RayPosition.y + random.random() * randomize,
-                )  # add point to list with random noise added. This noise is controllable by the initialization variables.
+            HitX.append(dx)
+            HitY.append(dy)
+            if InRock:  # distance marched along the ray
+                Ranges.append(
+                    (RayPosition.x - self.Robot.pos.x) * dx
+                    + (RayPosition.y - self.Robot.pos.y) * dy
+                )
+            else:  # if ray is not in rock, it hit the border of the environment, place it on the border exactly
+                Ranges.append(self.BorderIntersect(self.Robot.pos, dx, dy))
+
+        return HitX, HitY, Ranges
+
+    def ScanLidarAnalytic(
+        self, PointCount=365, accuracy=0.001, randomize=0.01, StartStopAngle=[], noise=None
+    ):
+        """Scan the lidar of the robot by intersecting each ray with the rocks and border in closed form.
+            Returns the same data as ScanLidar, but the edges are exact instead of step quantized.
+
+        Args:
+            PointCount (int, optional): How many points to scan. Defaults to 365.
+            accuracy (float, optional): Unused, kept so the scan methods are interchangeable. Defaults to 0.001.
+            randomize (float, positive float): How much to randomize the scan. Defaults to 0.01.
+            StartStopAngle (list [a,b], optional): Angle range to scan. Defaults to [], the full circle.
+            noise (Noise.NoiseModel, optional): Noise model applied to the whole scan at once. Defaults to None, DefaultNoise.
+
+        Returns:
+            list: List of the Points scanned, Position Objects.
+        """
+        return self.NoisyPoints(*self.AnalyticReturns(PointCount, StartStopAngle), randomize, noise)
+
+    def AnalyticReturns(self, PointCount=365, StartStopAngle=[]):
+        """Intersects every ray with the rocks and border in closed form, without noise.
+
+        Args:
+            PointCount (int, optional): How many points to scan. Defaults to 365.
+            StartStopAngle (list [a,b], optional): Angle range to scan. Defaults to [], the full circle.
+
+        Returns:
+            Tuple: (HitX, HitY, Ranges) lists of the ray direction and exact range of each return.
+        """
+
+        HitX, HitY, Ranges = [], [], []
+        self.UpdateRockIndex()
+
+        Plan = GetRayPlan(PointCount, StartStopAngle, self.Robot.DeadAngles)
+        RayX, RayY = Plan.Rotate(self.Robot.angle)
+        Bodies = self.RobotBodies()
+
+        for dx, dy, valid in zip(RayX.tolist(), RayY.tolist(), Plan.ValidList):  # for each point
+            if not valid:  # if angle is in dead angle, skip
+                continue
+
+            distance = self.BorderIntersect(self.Robot.pos, dx, dy)  # the border is always hit last
+            RockDistance, RockIndex = self.RockIndex.RayQuery(self.Robot.pos, dx, dy, distance)
+            if RockDistance is not None:  # a rock is in front of the border
+                distance = RockDistance
+            for (
+                body
+            ) in Bodies:  # the other robots move every frame, so they are not in the rock index
+                BodyDistance = body.RayIntersect(self.Robot.pos, dx, dy)
+                if BodyDistance is not None and BodyDistance < distance:
+                    distance = BodyDistance
+
+            HitX.append(dx)
+            HitY.append(dy)
+            Ranges.append(distance)
+
+        return HitX, HitY, Ranges
+
+    def NoisyArrays(self, HitX, HitY, Ranges, randomize=0.01, noise=None):
+        """Adds the noise of a whole scan in one call.
+
+        Args:
+            HitX (list): x components of the unit directions of the returns.
+            HitY (list): y components of the unit directions of the returns.
+            Ranges (list): Exact range of each return.
+            randomize (float, positive float): How much to randomize the scan. Defaults to 0.01.
+            noise (Noise.NoiseModel, optional): Noise model to apply. Defaults to None, DefaultNoise.
+
+        Returns:
+            Tuple: (X, Y) arrays of the field frame points, nan for dropped returns.
+        """
+        return (noise or DefaultNoise).Apply(
+            self.Robot.pos.x,
+            self.Robot.pos.y,
+            numpy.array(HitX, dtype=numpy.float64),
+            numpy.array(HitY, dtype=numpy.float64),
+            numpy.array(Ranges, dtype=numpy.float64),
+            randomize,
+        )
+
+    def NoisyPoints(self, HitX, HitY, Ranges, randomize=0.01, noise=None):
+        """NoisyArrays converted to points in both frames.
+
+        Returns:
+            Tuple: (field frame points, robot frame points) lists of Positions.
+        """
+        points = self.ArraysToPoints(*self.NoisyArrays(HitX, HitY, Ranges, randomize, noise))
+        return points, self.ToRobotFrame(points)
+
+    def BorderIntersect(self, origin, dx, dy):
+        """Finds the distance along a ray to the square border of the environment (ray to axis aligned box).
+
+        Args:
+            origin (Position): Start of the ray, inside the environment.
+            dx (float): x component of the unit direction of the ray.
+            dy (float): y component of the unit direction of the ray.
+
+        Returns:
+            float: Distance from the origin to where the ray leaves the environment.
+        """
+        half = self.SideSize / 2
+        distance = math.inf
+        if dx != 0:
+            distance = min(distance, (math.copysign(half, dx) - origin.x) / dx)
+        if dy != 0:
+            distance = min(distance, (math.copysign(half, dy) - origin.y) / dy)
+        return max(distance, 0)
+
+    def ScanLidarBatch(
+        self, Angles=None, PointCount=365, randomize=0.01, StartStopAngle=[], noise=None
+    ):
+        """Scan the lidar of the robot for a whole batch of rays at once with array operations.
+
+        Args:
+            Angles (numpy.ndarray, optional): Field frame angles of the rays. Defaults to None, the cached ray plan for PointCount and StartStopAngle.
+            PointCount (int, optional): How many points to scan if no angles are given. Defaults to 365.
+            randomize (float, positive float): How much to randomize the scan. Defaults to 0.01.
+            StartStopAngle (list [a,b], optional): Angle range to scan if no angles are given. Defaults to [], the full circle.
+            noise (Noise.NoiseModel, optional): Noise model applied to X and Y. Defaults to None, DefaultNoise.
+
+        Returns:
+            Tuple: (Ranges, X, Y) contiguous arrays, one entry per ray. Ranges are exact, rays in dead angles or dropped by the noise are nan.
+        """
+        if Angles is None:
+            Plan = GetRayPlan(PointCount, StartStopAngle, self.Robot.DeadAngles)
+            dx, dy = Plan.Rotate(self.Robot.angle)
+            Dead = ~Plan.Valid
+        else:
+            Angles = numpy.asarray(Angles, dtype=numpy.float64)
+            dx = numpy.cos(Angles)
+            dy = numpy.sin(Angles)
+            Dead = self.DeadMask(Angles)
+        ox, oy = self.Robot.pos.x, self.Robot.pos.y
+
+        Ranges = self.ObstacleRanges(dx, dy)[0]
+        Ranges[Dead] = numpy.nan
+
+        X, Y = (noise or DefaultNoise).Apply(ox, oy, dx, dy, Ranges, randomize)
+        return Ranges, X, Y
+
+    def ObstacleRanges(self, dx, dy):
+        """Intersects every ray with every obstacle as arrays and keeps the nearest hit, the core of ScanLidarBatch.
+
+        Args:
+            dx (numpy.ndarray): x components of the unit directions of the rays.
+            dy (numpy.ndarray): y components of the unit directions of the rays.
+
+        Returns:
+            Tuple: (Ranges, Obstacle) arrays, the exact range of each ray and the index in ObstacleArrays of the obstacle it hit, -1 for the border.
+        """
+        Ranges = self.BorderRanges(dx, dy)
+        Obstacle = numpy.full(len(Ranges), -1, dtype=numpy.int64)
+
+        RockX, RockY, RockRadius = self.ObstacleArrays()
+        if len(RockX) > 0:
+            OffsetX = self.Robot.pos.x - RockX
+            OffsetY = self.Robot.pos.y - RockY
+            c = OffsetX**2 + OffsetY**2 - RockRadius**2  # negative if the robot is inside the rock
+            BlockSize = max(1, 4_000_000 // len(RockX))  # bound the rays x rocks temporary arrays
+            for start in range(0, len(dx), BlockSize):
+                block = slice(start, start + BlockSize)
+                b = dx[block, None] * OffsetX + dy[block, None] * OffsetY
+                discriminant = b**2 - c
+                hit = (discriminant >= 0) & (b <= 0)
+                with numpy.errstate(invalid="ignore"):
+                    distance = numpy.where(hit, -b - numpy.sqrt(discriminant), numpy.inf)
+                distance = numpy.where(c < 0, 0, distance)
+                Nearest = distance.argmin(axis=1)
+                NearestRange = distance[numpy.arange(len(Nearest)), Nearest]
+                Closer = NearestRange < Ranges[block]  # the rock is in front of the border
+                Ranges[block] = numpy.where(Closer, NearestRange, Ranges[block])
+                Obstacle[block] = numpy.where(Closer, Nearest, -1)
+        return Ranges, Obstacle
+
+    def HitLabels(self, dx, dy):
+        """Finds what each ray hits first, the ground truth for evaluating processors.
+
+        Args:
+            dx (numpy.ndarray): x components of the unit directions of the rays.
+            dy (numpy.ndarray): y components of the unit directions of the rays.
+
+        Returns:
+            Tuple: (HitType, HitIndex) arrays, HIT_BORDER, HIT_ROCK or HIT_ROBOT and the index of the rock in Rocks or the robot in Robots, -1 for the border.
+        """
+        Obstacle = self.ObstacleRanges(dx, dy)[1]
+        RockCount = len(self.Rocks)
+        HitType = numpy.where(
+            Obstacle < 0, HIT_BORDER, numpy.where(Obstacle < RockCount, HIT_ROCK, HIT_ROBOT)
+        ).astype(numpy.int8)
+        # obstacle index to rock or robot index, the -1 of the border picks the last entry
+        Lookup = numpy.concatenate((numpy.arange(RockCount), self.OtherRobots(), [-1])).astype(
+            numpy.int64
+        )
+        return HitType, Lookup[Obstacle]
+
+    def ScanLabels(self, PointCount=365, StartStopAngle=[]):
+        """HitLabels for the rays of a scan, one label per ray like ScanLidarBatch and ScanLidarSweep.
+            The labels belong to the ray, a spurious return of the noise keeps the label of its ray.
+
+        Args:
+            PointCount (int, optional): How many points to scan. Defaults to 365.
+            StartStopAngle (list [a,b], optional): Angle range to scan. Defaults to [], the full circle.
+
+        Returns:
+            Tuple: (HitType, HitIndex) arrays, HIT_NONE and -1 for rays in dead angles.
+        """
+        Plan = GetRayPlan(PointCount, StartStopAngle, self.Robot.DeadAngles)
+        HitType, HitIndex = self.HitLabels(*Plan.Rotate(self.Robot.angle))
+        HitType[~Plan.Valid] = HIT_NONE
+        HitIndex[~Plan.Valid] = -1
+        return HitType, HitIndex
+
+    def ScanLidarSweep(self, PointCount=365, randomize=0.01, StartStopAngle=[], noise=None):
+        """Scan the lidar of the robot by projecting each rock onto the angular interval it covers (a 1-D z-buffer).
+            Every rock only touches the rays inside its interval, so the cost is about rocks + rays instead of rocks x rays.
+
+        Args:
+            PointCount (int, optional): How many points to scan. Defaults to 365.
+            randomize (float, positive float): How much to randomize the scan. Defaults to 0.01.
+            StartStopAngle (list [a,b], optional): Angle range to scan. Defaults to [], the full circle.
+            noise (Noise.NoiseModel, optional): Noise model applied to X and Y. Defaults to None, DefaultNoise.
+
+        Returns:
+            Tuple: (Ranges, X, Y) contiguous arrays, one entry per ray. Ranges are exact, rays in dead angles or dropped by the noise are nan.
+        """
+        Plan = GetRayPlan(PointCount, StartStopAngle, self.Robot.DeadAngles)
+        StartAngle = Plan.StartAngle + self.Robot.angle
+        step = Plan.Step
+
+        dx, dy = Plan.Rotate(self.Robot.angle)
+        ox, oy = self.Robot.pos.x, self.Robot.pos.y
+
+        Ranges = self.BorderRanges(dx, dy)  # the range buffer starts filled with the border
+
+        RockX, RockY, RockRadius = self.ObstacleArrays()
+        if len(RockX) > 0 and PointCount > 0:
+            OffsetX = RockX - ox
+            OffsetY = RockY - oy
+            Distance = numpy.hypot(OffsetX, OffsetY)
+
+            if numpy.any(Distance <= RockRadius):  # the robot is inside a rock, every ray hits at 0
+                Ranges[:] = 0
+            else:
+                HalfWidth = numpy.arcsin(RockRadius / Distance)  # half of the angle the rock covers
+                LowAngle = (numpy.arctan2(OffsetY, OffsetX) - HalfWidth - StartAngle) % (
+                    2 * math.pi
+                )
+
+                # the covered interval and the same interval one turn earlier, which catches the wrap around
+                Lows = numpy.concatenate((LowAngle, LowAngle - 2 * math.pi))
+                Highs = Lows + numpy.concatenate((HalfWidth, HalfWidth)) * 2
+                First = numpy.maximum(numpy.ceil(Lows / step), 0).astype(numpy.int64)
+                Last = numpy.minimum(numpy.floor(Highs / step), PointCount - 1).astype(numpy.int64)
+                Counts = numpy.maximum(Last - First + 1, 0)
+
+                # expand every interval into (rock, ray) pairs without a python loop
+                Rock = numpy.repeat(numpy.tile(numpy.arange(len(RockX)), 2), Counts)
+                Ray = numpy.repeat(First - numpy.cumsum(Counts) + Counts, Counts) + numpy.arange(
+                    Counts.sum()
+                )
+
+                # exact depth of each covered ray, the nearest rock wins
+                b = dx[Ray] * OffsetX[Rock] + dy[Ray] * OffsetY[Rock]
+                c = Distance[Rock] ** 2 - RockRadius[Rock] ** 2
+                Depth = b - numpy.sqrt(numpy.maximum(b**2 - c, 0))
+                numpy.minimum.at(Ranges, Ray, Depth)
+
+        Ranges[~Plan.Valid] = numpy.nan
+
+        X, Y = (noise or DefaultNoise).Apply(ox, oy, dx, dy, Ranges, randomize)
+        return Ranges, X, Y
+
+    def BorderRanges(self, dx, dy):
+        """Finds the distance along each ray to the square border of the environment, BorderIntersect for arrays.
+
+        Args:
+            dx (numpy.ndarray): x components of the unit directions of the rays.
+            dy (numpy.ndarray): y components of the unit directions of the rays.
+
+        Returns:
+            numpy.ndarray: Distance from the robot to where each ray leaves the environment.
+        """
+        half = self.SideSize / 2
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            Ranges = numpy.minimum(
+                numpy.where(dx != 0, (numpy.copysign(half, dx) - self.Robot.pos.x) / dx, numpy.inf),
+                numpy.where(dy != 0, (numpy.copysign(half, dy) - self.Robot.pos.y) / dy, numpy.inf),
+            )  # ray to box exit distance for the border
+        return numpy.maximum(Ranges, 0)
+
+    def ScanLidarArrayPoints(
+        self,
+        Method="Batch",
+        PointCount=365,
+        accuracy=0.001,
+        randomize=0.01,
+        StartStopAngle=[],
+        noise=None,
+    ):
+        """ScanLidarBatch or ScanLidarSweep with the same arguments and return values as ScanLidar.
+
+        Args:
+            Method (str, optional): "Batch" or "Sweep". Defaults to "Batch".
+            PointCount (int, optional): How many points to scan. Defaults to 365.
+            accuracy (float, optional): Unused, kept so the scan methods are interchangeable. Defaults to 0.001.
+            randomize (float, positive float): How much to randomize the scan. Defaults to 0.01.
+            StartStopAngle (list [a,b], optional): Angle range to scan. Defaults to [], the full circle.
+            noise (Noise.NoiseModel, optional): Noise model applied to the whole scan at once. Defaults to None, DefaultNoise.
+
+        Returns:
+            list: List of the Points scanned, Position Objects.
+        """
+        if Method == "Sweep":
+            Ranges, X, Y = self.ScanLidarSweep(PointCount, randomize, StartStopAngle, noise)
+        else:
+            Ranges, X, Y = self.ScanLidarBatch(None, PointCount, randomize, StartStopAngle, noise)
+        points = self.ArraysToPoints(X, Y)
+        return points, self.ToRobotFrame(points)
+
+    def ScanAngles(self, PointCount=365, StartStopAngle=[]):
+        """Returns the field frame angles of the rays of a scan at the robot's current angle, the same as the ones ScanLidar uses.
+
+        Args:
+            PointCount (int, optional): How many points to scan. Defaults to 365.
+            StartStopAngle (list [a,b], optional): Angle range to scan relative to the robot. Defaults to [], the full circle.
+
+        Returns:
+            numpy.ndarray: Angles of the rays.
+        """
+        return (
+            GetRayPlan(PointCount, StartStopAngle, self.Robot.DeadAngles).Angles + self.Robot.angle
+        )
+
+    def DeadMask(self, Angles):
+        """Checks an array of angles against the dead angles of the robot, the same as Bot.IsDead.
+
+        Args:
+            Angles (numpy.ndarray): Field frame angles to check.
+
+        Returns:
+            numpy.ndarray: Boolean array, True where the angle is in a dead angle.
+        """
+        Relative = (Angles - self.Robot.angle) % (math.pi * 2)
+        Dead = numpy.zeros(len(Angles), dtype=bool)
+        for deadRange in self.Robot.DeadAngles:
+            Dead |= (deadRange[0] <= Relative) & (Relative <= deadRange[1])
+        return Dead
+
+    def RockArrays(self):
+        """Returns the rocks as arrays for batched ray casting. The arrays are kept until the scene version changes,
+            so every robot and chunk scanned in a frame shares them. Move rocks with MoveRock so the arrays follow.
+
+        Returns:
+            Tuple: (x, y, radius) arrays of the rock centers and radii.
+        """
+        self.UpdateRockIndex()
+        if self.RockArrayCache is None or self.RockArrayCache[0] != self.SceneVersion:
+            self.RockArrayCache = (
+                self.SceneVersion,
+                (
+                    numpy.array([rock.pos.x for rock in self.Rocks], dtype=numpy.float64),
+                    numpy.array([rock.pos.y for rock in self.Rocks], dtype=numpy.float64),
+                    numpy.array([rock.diameter / 2 for rock in self.Rocks], dtype=numpy.float64),
+                ),
+            )
+        return self.RockArrayCache[1]
+
+    def ObstacleArrays(self):
+        """RockArrays with the bodies of the other robots added.
+
+        Returns:
+            Tuple: (x, y, radius) arrays of the obstacle centers and radii.
+        """
+        RockX, RockY, RockRadius = self.RockArrays()
+        Bodies = self.RobotBodies()
+        if not Bodies:
+            return RockX, RockY, RockRadius
+        return (
+            numpy.concatenate((RockX, [body.pos.x for body in Bodies])),
+            numpy.concatenate((RockY, [body.pos.y for body in Bodies])),
+            numpy.concatenate((RockRadius, [body.diameter / 2 for body in Bodies])),
+        )
+
+    def ArraysToPoints(self, X, Y):
+        """Converts scan arrays into a list of Positions, skipping rays in dead angles.
+
+        Args:
+            X (numpy.ndarray): x coordinates of the scan.
+            Y (numpy.ndarray): y coordinates of the scan.
+
+        Returns:
+            list: List of Positions.
+        """
+        Valid = ~numpy.isnan(X)
+        return [Common.Position(x, y) for x, y in zip(X[Valid].tolist(), Y[Valid].tolist())]
+
+    def Scan(self, Method="March", *args, **kwargs):
+        """Scan the lidar of the robot with the selected scan method.
+
+        Args:
+            Method (str, optional): "March" for the stepping scan, "Analytic" for the closed form scan, "Batch" for the array scan or "Sweep" for the angular sweep scan. Defaults to "March".
+            Remaining arguments are the ScanLidar arguments and are passed to the scan method.
+
+        Returns:
+            list: List of the Points scanned, Position Objects.
+        """
+        if Method == "March":
+            return self.ScanLidar(*args, **kwargs)
+        elif Method == "Analytic":
+            return self.ScanLidarAnalytic(*args, **kwargs)
+        elif Method in ("Batch", "Sweep"):
+            return self.ScanLidarArrayPoints(Method, *args, **kwargs)
+        raise ValueError(f"Unknown scan method {Method}")
+
+    def ScanArrays(
+        self,
+        Method="March",
+        PointCount=365,
+        accuracy=0.001,
+        randomize=0.01,
+        StartStopAngle=[],
+        noise=None,
+        labels=False,
+    ):
+        """Scan the lidar of the robot with the selected scan method and return arrays instead of Positions.
+
+        Args:
+            Method (str, optional): Scan method, see Scan. Defaults to "March".
+            labels (bool, optional): Also return the ground truth HitType and HitIndex of every entry, see ScanLabels. Defaults to False.
+            Remaining arguments are the ScanLidar arguments.
+
+        Returns:
+            Tuple: (X, Y) arrays of the field frame points, (X, Y, HitType, HitIndex) with labels.
+                Batch and Sweep keep one entry per ray with nan for rays without a return, March and Analytic only have the returns.
+        """
+        if Method == "March":
+            X, Y = self.NoisyArrays(
+                *self.MarchReturns(PointCount, accuracy, StartStopAngle), randomize, noise
             )
+        elif Method == "Analytic":
+            X, Y = self.NoisyArrays(
+                *self.AnalyticReturns(PointCount, StartStopAngle), randomize, noise
+            )
+        elif Method == "Sweep":
+            X, Y = self.ScanLidarSweep(PointCount, randomize, StartStopAngle, noise)[1:]
+        elif Method == "Batch":
+            X, Y = self.ScanLidarBatch(None, PointCount, randomize, StartStopAngle, noise)[1:]
+        else:
+            raise ValueError(f"Unknown scan method {Method}")
+        if not labels:
+            return X, Y
+
+        HitType, HitIndex = self.ScanLabels(PointCount, StartStopAngle)
+        if Method in ("March", "Analytic"):  # these only return the rays outside the dead angles
+            Valid = HitType != HIT_NONE
+            HitType, HitIndex = HitType[Valid], HitIndex[Valid]
+        return X, Y, HitType, HitIndex
+
+    def ToRobotFrameArrays(self, X, Y):
+        """ToRobotFrame for arrays of points.
+
+        Args:
+            X (numpy.ndarray): x coordinates in the field frame.
+            Y (numpy.ndarray): y coordinates in the field frame.
+
+        Returns:
+            Tuple: (X, Y) arrays in the robot frame, nan stays nan.
+        """
+        r = numpy.hypot(X - self.Robot.pos.x, Y - self.Robot.pos.y)
+        theta = numpy.arctan2(Y - self.Robot.pos.y, X - self.Robot.pos.x) + self.Robot.angle
+        return r * numpy.cos(theta), r * numpy.sin(theta)
+
+    def ToRobotFrame(self, points):
+        """Converts points relative to the field into points relative to the robot's position and angle.
+
+        Args:
+            points (list): List of Positions in the field frame.
 
-        # these points are relative to the field, so they must be converted to the robot's position and angle
+        Returns:
+            list: List of Positions in the robot frame.
+        """
         RobotDataPoints = []
         for point in points:
             r, theta = Common.Position(
@@ -155,4 +743,72 @@ class Environment:
                 Common.Position(r, theta + self.Robot.angle, False)
             )  # add the point to the list with the robot's angle added to the point's angle (rotation transformation)
 
-        return points, RobotDataPoints
+        return RobotDataPoints
+
+
+class RayPlan:
+    def __init__(self, PointCount=365, StartStopAngle=[], DeadAngles=[]):
+        """Precomputed rays of a scan in the robot frame, reused across frames and only rotated by the robot's angle.
+            Use GetRayPlan to get a cached plan instead of making a new one every frame.
+
+        Args:
+            PointCount (int, optional): How many points to scan. Defaults to 365.
+            StartStopAngle (list [a,b], optional): Angle range to scan relative to the robot. Defaults to [], the full circle.
+            DeadAngles (list [[a,b]], optional): Angles the lidar cannot reach, relative to the robot. Defaults to [].
+        """
+        if StartStopAngle == []:  # if no start and stop angle
+            self.StartAngle = 0
+            self.Step = 2 * math.pi / PointCount
+        else:
+            self.StartAngle = StartStopAngle[0]
+            self.Step = (StartStopAngle[1] - StartStopAngle[0]) / PointCount
+
+        self.Angles = self.StartAngle + numpy.arange(PointCount) * self.Step
+        self.Cos = numpy.cos(self.Angles)
+        self.Sin = numpy.sin(self.Angles)
+
+        Relative = self.Angles % (math.pi * 2)
+        self.Valid = numpy.ones(PointCount, dtype=bool)  # False where the ray is in a dead angle
+        for deadRange in DeadAngles:
+            self.Valid &= ~((deadRange[0] <= Relative) & (Relative <= deadRange[1]))
+        self.ValidList = self.Valid.tolist()  # for the per ray python scans
+
+    def __str__(self):
+        return f"RayPlan with {len(self.Angles)} rays, {int(self.Valid.sum())} valid"
+
+    def Rotate(self, angle):
+        """Rotates the ray directions to the field frame.
+
+        Args:
+            angle (Radian): Angle of the robot.
+
+        Returns:
+            Tuple: (dx, dy) arrays of the unit directions of the rays.
+        """
+        c = math.cos(angle)
+        s = math.sin(angle)
+        return self.Cos * c - self.Sin * s, self.Sin * c + self.Cos * s
+
+
+DefaultNoise = (
+    Noise.UniformNoise()
+)  # noise of scans without their own noise model, the original uniform noise
+
+RayPlans = {}  # cache of ray plans for this process, keyed on the scan settings
+
+
+def GetRayPlan(PointCount=365, StartStopAngle=[], DeadAngles=[]):
+    """Returns the cached ray plan for the scan settings, building it the first time.
+
+    Args:
+        PointCount (int, optional): How many points to scan. Defaults to 365.
+        StartStopAngle (list [a,b], optional): Angle range to scan relative to the robot. Defaults to [].
+        DeadAngles (list [[a,b]], optional): Angles the lidar cannot reach, relative to the robot. Defaults to [].
+
+    Returns:
+        RayPlan: The ray plan.
+    """
+    key = (PointCount, tuple(StartStopAngle), tuple(tuple(deadRange) for deadRange in DeadAngles))
+    if key not in RayPlans:
+        RayPlans[key] = RayPlan(PointCount, StartStopAngle, DeadAngles)
+    return RayPlans[key]
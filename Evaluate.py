@@ -0,0 +1,206 @@
+import Environment, GenerateDataset, Common, argparse, importlib, multiprocessing, time, json, sys
+import numpy
+
+
+def LoadProcessor(Path="DigitalProcessing.LidarDataProcessor"):
+    """Builds a processor from its module and class name.
+
+    Args:
+        Path (str, optional): "module.Class" of the processor. Defaults to "DigitalProcessing.LidarDataProcessor".
+
+    Returns:
+        object: New processor with AcceptableProcess, AcceptableData and IllegalData like LidarDataProcessor.
+    """
+    Module, Class = Path.rsplit(".", 1)
+    return getattr(importlib.import_module(Module), Class)()
+
+
+def RecordPoints(Record):
+    """Turns a dataset record into the robot frame points a processor sees and their ground truth.
+
+    Args:
+        Record (numpy.void): One scan record, see GenerateDataset.RecordType.
+
+    Returns:
+        Tuple: (points, HitType) list of robot frame Positions and the hit type of each point.
+    """
+    env = Environment.Environment(RockCount=0)
+    env.UpdateRobot(
+        Common.Position(float(Record["RobotX"]), float(Record["RobotY"])),
+        float(Record["RobotAngle"]),
+    )
+    X = Record["X"].astype(numpy.float64)
+    Y = Record["Y"].astype(numpy.float64)
+    Valid = ~numpy.isnan(X)  # dead angles and dropouts
+    RobotX, RobotY = env.ToRobotFrameArrays(X[Valid], Y[Valid])
+    points = [Common.Position(x, y) for x, y in zip(RobotX.tolist(), RobotY.tolist())]
+    return points, Record["HitType"][Valid]
+
+
+def EvaluateRecords(Processor, Records):
+    """Runs a processor on scan records and counts its wall decisions against the ground truth.
+        A point is a wall point if its ray hit the border, the processor calls it a wall by putting it in IllegalData.
+
+    Args:
+        Processor (object): Processor to evaluate, see LoadProcessor.
+        Records (numpy.ndarray): Scan records with labels.
+
+    Returns:
+        dict: Summed "TruePositive", "FalsePositive", "FalseNegative", "TrueNegative" and "Failed" counts,
+            and "Seconds" with the processing time of every frame that did not fail.
+    """
+    Result = {
+        "TruePositive": 0,
+        "FalsePositive": 0,
+        "FalseNegative": 0,
+        "TrueNegative": 0,
+        "Failed": 0,
+        "Seconds": [],
+    }
+    for Record in Records:
+        points, HitType = RecordPoints(Record)
+        Processor.AcceptableData = []
+        Processor.IllegalData = []  # an early return must not leave the last frame's result
+        start = time.perf_counter()
+        try:
+            Processor.AcceptableProcess(points)
+        except Exception:  # a processor failing on a frame is part of its score
+            Result["Failed"] += 1
+            continue
+        Result["Seconds"].append(time.perf_counter() - start)
+
+        # the processors return the same point objects they were given
+        Illegal = {id(point) for point in Processor.IllegalData}
+        Predicted = numpy.array([id(point) in Illegal for point in points], dtype=bool)
+        Wall = HitType == Environment.HIT_BORDER
+        Result["TruePositive"] += int(numpy.sum(Predicted & Wall))
+        Result["FalsePositive"] += int(numpy.sum(Predicted & ~Wall))
+        Result["FalseNegative"] += int(numpy.sum(~Predicted & Wall))
+        Result["TrueNegative"] += int(numpy.sum(~Predicted & ~Wall))
+    return Result
+
+
+def EvaluateEnvironment(Job):
+    """Scans one seeded environment like GenerateDataset and evaluates the processor on it. Runs in the pool processes.
+
+    Args:
+        Job (tuple): (index, settings, processor path).
+
+    Returns:
+        dict: See EvaluateRecords.
+    """
+    index, Settings, ProcessorPath = Job
+    Records = GenerateDataset.ScanEnvironment((index, Settings))[1]
+    return EvaluateRecords(LoadProcessor(ProcessorPath), Records)
+
+
+def EvaluateSlice(Job):
+    """Evaluates the processor on a slice of a dataset file. Runs in the pool processes.
+
+    Args:
+        Job (tuple): (dataset path, start, stop, processor path).
+
+    Returns:
+        dict: See EvaluateRecords.
+    """
+    Path, start, stop, ProcessorPath = Job
+    Records = GenerateDataset.LoadDataset(Path)[start:stop]
+    return EvaluateRecords(LoadProcessor(ProcessorPath), Records)
+
+
+def Summarize(Results):
+    """Adds up the results of the pool jobs into precision, recall and processing time statistics.
+
+    Args:
+        Results (list): Results of EvaluateRecords.
+
+    Returns:
+        dict: Counts, "Precision", "Recall", "F1" of the wall points and the frame time statistics in milliseconds.
+    """
+    Summary = {
+        Key: sum(Result[Key] for Result in Results)
+        for Key in ("TruePositive", "FalsePositive", "FalseNegative", "TrueNegative", "Failed")
+    }
+    Seconds = numpy.array([second for Result in Results for second in Result["Seconds"]])
+    Summary["Frames"] = len(Seconds) + Summary["Failed"]
+
+    Predicted = Summary["TruePositive"] + Summary["FalsePositive"]
+    Walls = Summary["TruePositive"] + Summary["FalseNegative"]
+    Precision = Summary["TruePositive"] / Predicted if Predicted else 0.0
+    Recall = Summary["TruePositive"] / Walls if Walls else 0.0
+    Summary["Precision"] = Precision
+    Summary["Recall"] = Recall
+    Summary["F1"] = 2 * Precision * Recall / (Precision + Recall) if Precision + Recall else 0.0
+    if len(Seconds):
+        p50, p95, p99 = numpy.percentile(Seconds * 1000, [50, 95, 99]).tolist()
+        Summary.update(MeanMs=float(Seconds.mean() * 1000), P50Ms=p50, P95Ms=p95, P99Ms=p99)
+    return Summary
+
+
+def Main(argv=None):
+    """Command line entry point. Evaluates a processor's wall filter on seeded environments or a dataset file.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to None, sys.argv.
+
+    Returns:
+        dict: The summary, see Summarize.
+    """
+    parser = argparse.ArgumentParser(
+        description="Evaluate the wall filter of a processor against ground truth labels on a process pool."
+    )
+    parser.add_argument(
+        "--processor",
+        default="DigitalProcessing.LidarDataProcessor",
+        help="module.Class of the processor",
+    )
+    parser.add_argument("--dataset", help="evaluate a GenerateDataset file instead of new scans")
+    parser.add_argument("-o", "--output", help="write the summary to this JSON file")
+    GenerateDataset.AddSceneArguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.dataset:
+        Total = len(GenerateDataset.LoadDataset(args.dataset))
+        Step = max(1, args.poses)
+        Jobs = [
+            (args.dataset, start, min(start + Step, Total), args.processor)
+            for start in range(0, Total, Step)
+        ]
+        Worker = EvaluateSlice
+        print(f"Evaluating {args.processor} on {Total} scans of {args.dataset}", file=sys.stderr)
+    else:
+        Settings = GenerateDataset.SceneSettings(args)
+        Jobs = [(index, Settings, args.processor) for index in range(args.environments)]
+        Worker = EvaluateEnvironment
+        print(
+            f"Evaluating {args.processor} on {args.environments * args.poses} scans with seed {Settings['Seed']}",
+            file=sys.stderr,
+        )
+
+    start = time.time()
+    Results = []
+    with multiprocessing.Pool(args.processes) as pool:
+        for Result in pool.imap_unordered(Worker, Jobs):
+            Results.append(Result)
+            print(
+                f"\r{len(Results)}/{len(Jobs)} jobs, {time.time() - start:.0f}s",
+                end="",
+                file=sys.stderr,
+            )
+    print(file=sys.stderr)
+
+    Summary = Summarize(Results)
+    for Key, Value in Summary.items():
+        print(f"{Key}: {Value:.4g}" if isinstance(Value, float) else f"{Key}: {Value}")
+    if args.output:
+        with open(args.output, "w") as File:
+            json.dump(
+                {"processor": args.processor, "arguments": vars(args), "summary": Summary},
+                File,
+                indent=1,
+            )
+    return Summary
+
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,188 @@
+import Environment, Noise, Common, argparse, multiprocessing, random, math, time, sys, os
+import numpy
+
+
+def RecordType(PointCount):
+    """Returns the record layout of one scan in a dataset file.
+
+    Args:
+        PointCount (int): Number of rays per scan.
+
+    Returns:
+        numpy.dtype: Structured type with the environment and pose numbers, the robot pose, the exact ranges, the noisy field frame points
+            and the ground truth labels of the rays.
+    """
+    return numpy.dtype(
+        [
+            ("Environment", numpy.int32),
+            ("Pose", numpy.int32),
+            ("RobotX", numpy.float32),
+            ("RobotY", numpy.float32),
+            ("RobotAngle", numpy.float32),
+            ("Ranges", numpy.float32, (PointCount,)),  # exact, nan for dead angles
+            ("X", numpy.float32, (PointCount,)),  # noisy, nan for dead angles and dropouts
+            ("Y", numpy.float32, (PointCount,)),
+            ("HitType", numpy.int8, (PointCount,)),  # Environment.HIT_*, HIT_NONE for dead angles
+            ("HitIndex", numpy.int32, (PointCount,)),  # index of the rock hit, -1 for the border
+        ]
+    )
+
+
+def LoadDataset(path):
+    """Opens a dataset file without reading it into memory.
+
+    Args:
+        path (str): Path of the .npy dataset file.
+
+    Returns:
+        numpy.ndarray: Memory mapped array of scan records, see RecordType.
+    """
+    return numpy.load(path, mmap_mode="r")
+
+
+def ScanEnvironment(Job):
+    """Builds one random environment and scans it from random robot poses. Runs in the pool processes.
+
+    Args:
+        Job (tuple): (index, settings) where settings is the dict made by Main from the command line.
+
+    Returns:
+        Tuple: (index, records) with one record per pose.
+    """
+    index, Settings = Job
+    random.seed(f"{Settings['Seed']}-{index}")  # every environment is reproducible on its own
+    env = Environment.Environment(
+        SideSize=Settings["SideSize"],
+        RockCount=Settings["RockCount"],
+        RockDiameter=Settings["RockDiameter"],
+        RobotDeadAngles=Settings["DeadAngles"],
+    )
+    if Settings["Noise"] == "range":
+        NoiseModel = Noise.RangeNoise(
+            DropoutRate=Settings["Dropout"], SpuriousRate=Settings["Spurious"]
+        )
+    else:
+        NoiseModel = Noise.UniformNoise()
+    NoiseModel.Seed(Settings["Seed"], index)
+
+    Records = numpy.zeros(Settings["Poses"], dtype=RecordType(Settings["PointCount"]))
+    for pose in range(Settings["Poses"]):
+        for attempt in range(100):  # keep the robot out of the rocks
+            pos = Common.Position(
+                (random.random() - 0.5) * env.SideSize, (random.random() - 0.5) * env.SideSize
+            )
+            if not any(rock.IsIn(pos) for rock in env.Rocks):
+                break
+        env.UpdateRobot(pos, random.random() * 2 * math.pi)
+
+        if Settings["Method"] == "Sweep":
+            Ranges, X, Y = env.ScanLidarSweep(
+                Settings["PointCount"], Settings["Randomize"], noise=NoiseModel
+            )
+        else:
+            Ranges, X, Y = env.ScanLidarBatch(
+                None, Settings["PointCount"], Settings["Randomize"], noise=NoiseModel
+            )
+
+        Record = Records[pose]
+        Record["Environment"] = index
+        Record["Pose"] = pose
+        Record["RobotX"] = pos.x
+        Record["RobotY"] = pos.y
+        Record["RobotAngle"] = env.Robot.angle
+        Record["Ranges"] = Ranges
+        Record["X"] = X
+        Record["Y"] = Y
+        Record["HitType"], Record["HitIndex"] = env.ScanLabels(Settings["PointCount"])
+    return index, Records
+
+
+def AddSceneArguments(parser):
+    """Adds the environment, scan and noise options shared by the dataset and evaluation command lines.
+
+    Args:
+        parser (argparse.ArgumentParser): Parser to add the options to.
+    """
+    parser.add_argument("-e", "--environments", type=int, default=100, help="random environments")
+    parser.add_argument("-p", "--poses", type=int, default=10, help="robot poses per environment")
+    parser.add_argument("-n", "--points", type=int, default=360, help="rays per scan")
+    parser.add_argument("--side-size", type=float, default=30, help="size of the environments")
+    parser.add_argument("--rocks", type=int, default=15, help="rocks per environment")
+    parser.add_argument("--rock-diameter", type=float, default=1.5, help="0 for random sizes")
+    parser.add_argument("--method", choices=["Batch", "Sweep"], default="Sweep", help="scan method")
+    parser.add_argument("--noise", choices=["uniform", "range"], default="uniform")
+    parser.add_argument("--randomize", type=float, default=0.05, help="uniform noise amount")
+    parser.add_argument("--dropout", type=float, default=0.0, help="range noise dropout rate")
+    parser.add_argument("--spurious", type=float, default=0.0, help="range noise spurious rate")
+    parser.add_argument("--seed", type=int, default=None, help="random when not given")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="pool size")
+
+
+def SceneSettings(args):
+    """Turns the options added by AddSceneArguments into the settings ScanEnvironment takes.
+
+    Args:
+        args (argparse.Namespace): Parsed command line.
+
+    Returns:
+        dict: Settings of the scans, with a random seed when none was given.
+    """
+    return {
+        "Seed": args.seed if args.seed is not None else random.randrange(2**31),
+        "Poses": args.poses,
+        "PointCount": args.points,
+        "SideSize": args.side_size,
+        "RockCount": args.rocks,
+        "RockDiameter": args.rock_diameter,
+        "DeadAngles": [],
+        "Method": args.method,
+        "Noise": args.noise,
+        "Randomize": args.randomize,
+        "Dropout": args.dropout,
+        "Spurious": args.spurious,
+    }
+
+
+def Main(argv=None):
+    """Command line entry point. Generates Environments x Poses scans on a process pool and writes them to a .npy file.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to None, sys.argv.
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate a lidar scan dataset without the gui. Read it back with GenerateDataset.LoadDataset."
+    )
+    parser.add_argument("output", help="path of the .npy file to write")
+    AddSceneArguments(parser)
+    args = parser.parse_args(argv)
+
+    Settings = SceneSettings(args)
+
+    Total = args.environments * args.poses
+    Output = numpy.lib.format.open_memmap(
+        args.output, mode="w+", dtype=RecordType(args.points), shape=(Total,)
+    )  # results are written in place as they arrive, the file is the size of the whole dataset
+    print(f"Writing {Total} scans to {args.output} with seed {Settings['Seed']}", file=sys.stderr)
+
+    start = time.time()
+    LastReport = start
+    Done = 0
+    with multiprocessing.Pool(args.processes) as pool:
+        Jobs = ((index, Settings) for index in range(args.environments))
+        for index, Records in pool.imap_unordered(ScanEnvironment, Jobs):
+            Output[index * args.poses : (index + 1) * args.poses] = Records
+            Done += len(Records)
+            if time.time() - LastReport > 1 or Done == Total:  # progress about once per second
+                LastReport = time.time()
+                elapsed = LastReport - start
+                print(
+                    f"\r{Done}/{Total} scans, {Done / max(elapsed, 1e-9):.0f} scans/s, {elapsed:.0f}s",
+                    end="",
+                    file=sys.stderr,
+                )
+    Output.flush()
+    print(file=sys.stderr)
+
+
+if __name__ == "__main__":
+    Main()
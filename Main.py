@@ -20,8 +20,11 @@ if __name__ == "__main__":  # initialize the object only once.
         PointCount=360,
     )
     # Instance = RealIntegration.RealLidar(SideSize=300, GuiScale=2)
-# Simulation initializes all the threads and then ends. this must be modified to run without GUI.
+# Simulation initializes all the threads and then ends.
 # the gui thread is the only thread that is non-daemon, so the program will end when the gui is closed.
+# to run without GUI pass ShowGui=False and read the frames with Simulation.Frames() or Simulation.Run(Frames=N).
+# the processor skips to the newest frame when it falls behind, pass ConflateFrames=False to process every frame.
+# pass StreamChunks=True to process the scan chunk by chunk while it is scanned, so little is left after the last ray.
 
 # processing of data should be done in the DigitalProcessing file.
 # any additional functions that need to be called should be done in Sim.py ProcessThread() function. this may be changed in the future to a process thread function in the LidarDataProcessor class.
@@ -0,0 +1,162 @@
+import collections, threading, json, time, os
+import numpy
+
+
+class RollingHistogram:
+    def __init__(self, Window=1000):
+        """Keeps the last Window samples of a stage duration for percentiles, and the count and sum of all samples.
+
+        Args:
+            Window (int, optional): Number of recent samples the percentiles are taken over. Defaults to 1000.
+        """
+        self.Samples = collections.deque(maxlen=Window)
+        self.Count = 0
+        self.Sum = 0.0
+
+    def __str__(self):
+        return f"RollingHistogram with {self.Count} samples"
+
+    def Add(self, Value):
+        """Adds a sample.
+
+        Args:
+            Value (float): Sample to add, seconds for stage timings.
+        """
+        self.Samples.append(Value)
+        self.Count += 1
+        self.Sum += Value
+
+    def Summary(self):
+        """Returns the count, sum, mean and p50/p95/p99 of the samples.
+
+        Returns:
+            dict: Summary of the samples, the percentiles are over the rolling window.
+        """
+        Summary = {"count": self.Count, "sum": self.Sum}
+        if self.Samples:
+            p50, p95, p99 = numpy.percentile(numpy.fromiter(self.Samples, float), [50, 95, 99])
+            Summary.update(mean=self.Sum / self.Count, p50=p50, p95=p95, p99=p99)
+        return Summary
+
+
+class Metrics:
+    def __init__(self, Window=1000):
+        """Stage timings and gauges of a pipeline. Safe to record from several threads.
+
+        Args:
+            Window (int, optional): Samples kept per stage for the percentiles. Defaults to 1000.
+        """
+        self.Window = Window
+        self.Stages = {}
+        self.Gauges = {}
+        self.Lock = threading.Lock()
+        self.ExportThread = None
+
+    def __str__(self):
+        return f"Metrics of {len(self.Stages)} stages and {len(self.Gauges)} gauges"
+
+    def Record(self, Stage, Seconds):
+        """Adds a duration to the histogram of a stage.
+
+        Args:
+            Stage (str): Name of the stage.
+            Seconds (float): Duration of the stage.
+        """
+        with self.Lock:
+            if Stage not in self.Stages:
+                self.Stages[Stage] = RollingHistogram(self.Window)
+            self.Stages[Stage].Add(Seconds)
+
+    def Gauge(self, Name, Value):
+        """Sets a gauge, like a queue depth, to its current value.
+
+        Args:
+            Name (str): Name of the gauge.
+            Value (float): Current value.
+        """
+        with self.Lock:
+            self.Gauges[Name] = Value
+
+    def Snapshot(self):
+        """Returns the current state of all stages and gauges.
+
+        Returns:
+            dict: {"time", "stages": {stage: summary}, "gauges": {name: value}}.
+        """
+        with self.Lock:
+            return {
+                "time": time.time(),
+                "stages": {Stage: Histogram.Summary() for Stage, Histogram in self.Stages.items()},
+                "gauges": dict(self.Gauges),
+            }
+
+    def ToJson(self):
+        """Returns the snapshot as one line of JSON.
+
+        Returns:
+            str: JSON line without the newline.
+        """
+        return json.dumps(self.Snapshot())
+
+    def ToPrometheus(self, Prefix="lidarsim"):
+        """Returns the snapshot in the Prometheus text format, the stages as summaries and the gauges as gauges.
+
+        Args:
+            Prefix (str, optional): Prefix of the metric names. Defaults to "lidarsim".
+
+        Returns:
+            str: Prometheus text exposition.
+        """
+        Snapshot = self.Snapshot()
+        Lines = [f"# TYPE {Prefix}_stage_seconds summary"]
+        for Stage, Summary in sorted(Snapshot["stages"].items()):
+            for Quantile, Key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                if Key in Summary:
+                    Lines.append(
+                        f'{Prefix}_stage_seconds{{stage="{Stage}",quantile="{Quantile}"}} {Summary[Key]}'
+                    )
+            Lines.append(f'{Prefix}_stage_seconds_sum{{stage="{Stage}"}} {Summary["sum"]}')
+            Lines.append(f'{Prefix}_stage_seconds_count{{stage="{Stage}"}} {Summary["count"]}')
+        Lines.append(f"# TYPE {Prefix}_gauge gauge")
+        for Name, Value in sorted(Snapshot["gauges"].items()):
+            Lines.append(f'{Prefix}_gauge{{name="{Name}"}} {Value}')
+        return "\n".join(Lines) + "\n"
+
+    def Export(self, Path, Format="json"):
+        """Writes the metrics to a file once. JSON lines are appended, the Prometheus file is replaced as a whole.
+
+        Args:
+            Path (str): File to write.
+            Format (str, optional): "json" for JSON lines or "prometheus" for the Prometheus text format. Defaults to "json".
+        """
+        if Format == "json":
+            with open(Path, "a") as File:
+                File.write(self.ToJson() + "\n")
+        elif Format == "prometheus":
+            # replaced in one step so readers never see half a file
+            with open(Path + ".tmp", "w") as File:
+                File.write(self.ToPrometheus())
+            os.replace(Path + ".tmp", Path)
+        else:
+            raise ValueError(f"Unknown metrics format {Format}")
+
+    def StartExport(self, Path, Interval=10, Format="json", Stopping=None):
+        """Starts a daemon thread that calls Export every Interval seconds.
+
+        Args:
+            Path (str): File to write.
+            Interval (float, optional): Seconds between exports. Defaults to 10.
+            Format (str, optional): "json" or "prometheus", see Export. Defaults to "json".
+            Stopping (threading.Event, optional): Stops the thread after one last export when set. Defaults to None, run until the program ends.
+        """
+        if Format not in ("json", "prometheus"):
+            raise ValueError(f"Unknown metrics format {Format}")
+        Stopping = Stopping or threading.Event()
+
+        def ExportLoop():
+            while not Stopping.wait(Interval):
+                self.Export(Path, Format)
+            self.Export(Path, Format)
+
+        self.ExportThread = threading.Thread(target=ExportLoop, daemon=True, name="MetricsExport")
+        self.ExportThread.start()
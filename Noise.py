@@ -0,0 +1,86 @@
+import numpy
+
+
+class NoiseModel:
+    def __init__(self, Seed=None):
+        """Base noise model for simulated scans. All noise of a frame is drawn at once from the model's own generator.
+            Subclasses override Apply.
+
+        Args:
+            Seed (int, optional): Seed of the random generator, None for an unseeded generator. Defaults to None.
+        """
+        self.Seed(Seed)
+
+    def __str__(self):
+        return f"{type(self).__name__} with seed {self.InitSeed}"
+
+    def Seed(self, Seed=None, Worker=0):
+        """Reseeds the random generator. Each worker passes its own number so workers draw different but reproducible noise.
+
+        Args:
+            Seed (int, optional): Base seed, None for an unseeded generator. Defaults to None.
+            Worker (int, optional): Number of the worker using this model. Defaults to 0.
+        """
+        self.InitSeed = Seed
+        self.Generator = numpy.random.default_rng(None if Seed is None else [Seed, Worker])
+
+    def Apply(self, ox, oy, dx, dy, Ranges, randomize=0.01):
+        """Turns the exact ranges of a scan into noisy field frame points.
+
+        Args:
+            ox (float): x position of the lidar.
+            oy (float): y position of the lidar.
+            dx (numpy.ndarray): x components of the unit directions of the rays.
+            dy (numpy.ndarray): y components of the unit directions of the rays.
+            Ranges (numpy.ndarray): Exact range of each ray, nan for rays without a return.
+            randomize (float, optional): Noise amount passed to the scan. Defaults to 0.01.
+
+        Returns:
+            Tuple: (X, Y) arrays of the points, nan for rays without a return.
+        """
+        return ox + dx * Ranges, oy + dy * Ranges
+
+
+class UniformNoise(NoiseModel):
+    def __init__(self, Seed=None):
+        """Adds uniform noise in [0, randomize) to the x and y of each point, the original scan noise.
+
+        Args:
+            Seed (int, optional): Seed of the random generator. Defaults to None.
+        """
+        super().__init__(Seed)
+
+    def Apply(self, ox, oy, dx, dy, Ranges, randomize=0.01):
+        Noise = self.Generator.random((2, len(Ranges))) * randomize
+        return ox + dx * Ranges + Noise[0], oy + dy * Ranges + Noise[1]
+
+
+class RangeNoise(NoiseModel):
+    def __init__(self, Sigma=0.005, RangeScale=0.01, DropoutRate=0.0, SpuriousRate=0.0, Seed=None):
+        """Gaussian range noise that grows with range, plus dropped returns and spurious returns along the ray.
+
+        Args:
+            Sigma (float, optional): Standard deviation of the range noise at range 0. Defaults to 0.005.
+            RangeScale (float, optional): Standard deviation added per unit of range. Defaults to 0.01.
+            DropoutRate (float, optional): Chance a ray has no return. Defaults to 0.0.
+            SpuriousRate (float, optional): Chance a ray returns at a random point before its hit. Defaults to 0.0.
+            Seed (int, optional): Seed of the random generator. Defaults to None.
+        """
+        self.Sigma = Sigma
+        self.RangeScale = RangeScale
+        self.DropoutRate = DropoutRate
+        self.SpuriousRate = SpuriousRate
+        super().__init__(Seed)
+
+    def Apply(self, ox, oy, dx, dy, Ranges, randomize=0.01):
+        Gaussian = self.Generator.standard_normal(len(Ranges))
+        Uniform = self.Generator.random(
+            (3, len(Ranges))
+        )  # dropout, spurious and spurious range draws
+
+        Noisy = Ranges + Gaussian * (self.Sigma + self.RangeScale * Ranges)
+        Spurious = Uniform[1] < self.SpuriousRate
+        Noisy[Spurious] = Ranges[Spurious] * Uniform[2][Spurious]  # anywhere along the ray length
+        Noisy[Uniform[0] < self.DropoutRate] = numpy.nan
+        Noisy = numpy.maximum(Noisy, 0)  # nan stays nan
+        return ox + dx * Noisy, oy + dy * Noisy
@@ -1,5 +1,5 @@
-import Common, DigitalProcessing, math, guizero
-import serial, serial.tools.list_ports, threading, multiprocessing, time
+import Common, DigitalProcessing, math
+import threading, multiprocessing, queue, time
 
 
 class RealLidar:
@@ -7,20 +7,27 @@ class RealLidar:
         self,
         SerialCom=None,
         BaudRate=115200,
-        Processor=DigitalProcessing.LidarDataProcessor(),
+        Processor=None,
         ShowGui=True,
         GuiScale=20,
         SideSize=30,
+        StreamChunks=False,
+        ChunkPoints=90,
     ):
         """Initializes the real lidar object. This object is a wrapper for the serial port and the lidar data processor.
 
         Args:
             SerialCom (String, optional): The port of the arduino. Defaults to None. (Connects to the first port found)
             BaudRate (int, optional): The serial connection speed. Defaults to 115200.
-            Processor (LidarDataProcessor, optional): Algorithm to process incoming lidar data. Defaults to DigitalProcessing.LidarDataProcessor().
+            Processor (LidarDataProcessor, optional): Algorithm to process incoming lidar data. Defaults to None, a new DigitalProcessing.LidarDataProcessor().
             ShowGui (bool, optional): Whether or not to show the gui. Defaults to True.
             GuiScale (int, optional): The scale of the gui. Defaults to 20.
             SideSize (int, optional): The size of the environment canvas. Defaults to 30.
+            StreamChunks (bool, optional): If true, the points go to the processor in chunks while the lidar turns, so only the last chunk and FinishFrame
+                are left when a rotation ends. The processor needs BeginFrame, ProcessChunk and FinishFrame like DigitalProcessing.LidarDataProcessor
+                and a scan is skipped if it starts while the last one still waits for the processor. If false, AcceptableProcess gets whole scans
+                and skips to the newest when it falls behind. Defaults to False.
+            ChunkPoints (int, optional): Points per chunk with StreamChunks. Defaults to 90, a quarter turn.
         """
         self.ShowGui = ShowGui
         self.GuiScale = GuiScale
@@ -30,6 +37,8 @@ class RealLidar:
         self.InitSideSize = SideSize
 
         if SerialCom == None:
+            import serial.tools.list_ports
+
             try:
                 SerialCom = serial.tools.list_ports.comports()[0].device
             except IndexError:
@@ -38,17 +47,35 @@ class RealLidar:
 
         self.ProcessorInfoQueue = multiprocessing.JoinableQueue()
         self.ProcessorReturnQueue = multiprocessing.Queue()
-        self.Processor = Processor
+        self.Processor = (
+            Processor if Processor is not None else DigitalProcessing.LidarDataProcessor()
+        )
 
         self.RobotLidarData = []  # List of points from the lidar
 
+        self.FrameQueue = (
+            queue.Queue()
+        )  # full scans waiting for the processor, None once reading stopped
+        self.LastFrame = Common.Frame()  # last scan read
+        self.ProcessedFrame = Common.Frame()  # last processed scan, with the processing results
+        self.ConflatedFrames = 0  # scans the processor skipped in total
+        self.StreamChunks = StreamChunks
+
+        self.Stopping = multiprocessing.Event()  # set by Stop, shared with the reading process
+
         self.ReadReturnQueue = multiprocessing.Queue()
         self.ScanThread = threading.Thread(target=self.ReadDataCoordinator, daemon=True)
         self.ScanThread.start()
 
         self.ScanCoordinator = multiprocessing.Process(
             target=ReadDataProcess,
-            args=(SerialCom, BaudRate, self.ReadReturnQueue),
+            args=(
+                SerialCom,
+                BaudRate,
+                self.ReadReturnQueue,
+                self.Stopping,
+                ChunkPoints if StreamChunks else None,
+            ),
             daemon=True,
             name="ScanThread",
         )
@@ -70,10 +97,25 @@ class RealLidar:
         )
         self.ProcessorMultiProcess.start()
 
+    def Stop(self, timeout=None):
+        """Stops the serial reading and processing threads and processes. The gui is left open.
+
+        Args:
+            timeout (float, optional): Seconds to wait for each process. Defaults to None, wait until they stop.
+        """
+        self.Stopping.set()
+        self.ScanThread.join()
+        self.ProcessorCoordinator.join()
+        for process in (self.ScanCoordinator, self.ProcessorMultiProcess):
+            process.join(timeout)
+
     def OpenGui(self):
         # Initialize the gui and all the gui elements
         # it updates every 10ms
         if self.ShowGui:
+            # guizero is only imported here so the packet parsing and headless runs can be used without it
+            import guizero
+
             TotalWidth = self.SideSize * self.GuiScale
             self.app = guizero.App(
                 title="Lidar", width=TotalWidth + 200, height=TotalWidth + 100, layout="grid"
@@ -216,31 +258,87 @@ class RealLidar:
     def ProcessQueueCoordinator(self):
         # this thread is responsible for sending the lidar data to the processing thread and collecting the data
         # this class can only communicate to the multiprocessing threads through queues
+        # it sleeps until a new scan arrives and skips to the newest scan if the processor fell behind
         while True:
-            self.ProcessorInfoQueue.put(
-                self.RobotLidarData
-            )  # send the lidar data to the processing thread
-            self.ProcessorInfoQueue.join()  # wait for the processing thread to finish
-
-            (
-                self.Processor.AcceptableData,
-                self.Processor.IllegalData,
-                self.Processor.POI,
-            ) = (
+            Frame = self.FrameQueue.get()
+            if Frame is None:
+                break
+            while not self.StreamChunks:  # streamed scans were skipped while reading
+                try:
+                    Newer = self.FrameQueue.get_nowait()
+                except queue.Empty:
+                    break
+                if Newer is None:  # process the newest scan, then stop
+                    self.FrameQueue.put(None)
+                    break
+                Newer.Conflated = Frame.Conflated + 1
+                Frame = Newer
+            self.ConflatedFrames += Frame.Conflated
+
+            start = time.time()
+            if not self.StreamChunks:  # streamed scans were sent chunk by chunk while reading
+                self.ProcessorInfoQueue.put(
+                    ("frame", Frame.FrameID, Frame.RobotLidarData)
+                )  # send the lidar data to the processing thread
+                self.ProcessorInfoQueue.join()  # wait for the processing thread to finish
+
+            # get the data from the processing thread for the gui
+            FrameID, Frame.AcceptableData, Frame.IllegalData, Frame.POI = (
                 self.ProcessorReturnQueue.get()
-            )  # get the data from the processing thread for the gui
+            )
+            if FrameID != Frame.FrameID:
+                raise RuntimeError(f"Processed scan {FrameID} instead of scan {Frame.FrameID}")
+            Frame.DoneTime = time.time()
+            Frame.ProcessTime = Frame.DoneTime - start
+            self.ProcessedFrame = Frame
+            self.Processor.AcceptableData = Frame.AcceptableData
+            self.Processor.IllegalData = Frame.IllegalData
+            self.Processor.POI = Frame.POI
+
+        self.ProcessorInfoQueue.put(None)  # tell the processing thread to stop
 
     def ReadDataCoordinator(self):
         # this thread is responsible for reading the data from the serial port and sending it to the processing thread
         # this class can only communicate to the multiprocessing threads through queues
+        # streamed scans come as (points, last) chunks, their chunks go on to the processor as they arrive
+        # a streamed scan that starts while the last one still waits for the processor is skipped,
+        # so the queues hold at most the scan being processed, the one waiting and the one being read
+        FrameID = 0
+        Rotation = None  # points of the streamed scan so far
+        Skipping = False  # the streamed scan is not sent to the processor
+        Skipped = 0  # scans skipped since the last one sent
         while True:
-            if self.ReadReturnQueue.empty():
-                time.sleep(0.01)
-                continue
-
-            self.RobotLidarData = []
-            self.RobotLidarData = self.ReadReturnQueue.get()
+            # blocks until a full scan or chunk arrives, None once reading stopped
+            Data = self.ReadReturnQueue.get()
+            if Data is None:
+                self.FrameQueue.put(None)  # tell the processing coordinator no more scans come
+                return
+            if self.StreamChunks:
+                Chunk, Last = Data
+                if Rotation is None:  # first chunk of a new scan
+                    Rotation = []
+                    FrameID += 1
+                    Skipping = self.FrameQueue.qsize() > 0  # the processor fell behind
+                Rotation += Chunk
+                if not Skipping:
+                    self.ProcessorInfoQueue.put(("chunk", FrameID, Chunk))
+                if not Last:
+                    continue
+                Data, Rotation = Rotation, None
+            else:
+                FrameID += 1
+            self.RobotLidarData = Data
             # print(len(self.RobotLidarData))
+            self.LastFrame = Common.Frame(FrameID, time.time(), [], Data)
+            self.LastFrame.QueuedTime = self.LastFrame.Time
+            if self.StreamChunks:
+                if Skipping:  # the processor never gets this scan
+                    Skipped += 1
+                    continue
+                self.ProcessorInfoQueue.put(("finish", FrameID, None))
+            self.LastFrame.Conflated = Skipped  # counted by the processing coordinator
+            Skipped = 0
+            self.FrameQueue.put(self.LastFrame)  # wakes the processing coordinator
 
 
 def ProcessThread(Processor, ProcessorInfoQueue, ProcessorReturnQueue):
@@ -248,29 +346,54 @@ def ProcessThread(Processor, ProcessorInfoQueue, ProcessorReturnQueue):
     # it takes the lidar data and processes it
     # is is a separate process from the main process so it is encapsulated with limited access to the environment (no cheating)
     # it has the full performance of a python interpreter so it can be used to do more complex processing
+    # it blocks until data arrives and stops when it gets None
+    # a scan comes whole as ("frame", scan id, points) or as ("chunk", scan id, points) jobs and ("finish", scan id, None)
+    StreamedFrame = None  # scan the chunks belong to
     while True:
-        if ProcessorInfoQueue.empty():
-            time.sleep(0.001)
-            continue
-        Processor.RobotLidarData = ProcessorInfoQueue.get()
+        Job = ProcessorInfoQueue.get()
+        if Job is None:
+            ProcessorInfoQueue.task_done()
+            return
+        Kind, FrameID, Points = Job
         # add any more functions that need to be run here
-        Processor.AcceptableProcess()
-        ProcessorReturnQueue.put((Processor.AcceptableData, Processor.IllegalData, Processor.POI))
+        if Kind == "frame":
+            Processor.RobotLidarData = Points
+            Processor.AcceptableProcess()
+        elif Kind == "chunk":
+            if FrameID != StreamedFrame:  # first chunk of a new scan
+                Processor.BeginFrame()
+                StreamedFrame = FrameID
+            Processor.ProcessChunk(Points)
+        else:
+            Processor.FinishFrame()
+        if Kind != "chunk":
+            Processor.FindPOI()  # rocks among the acceptable points
+            ProcessorReturnQueue.put(
+                (FrameID, Processor.AcceptableData, Processor.IllegalData, Processor.POI)
+            )
 
         ProcessorInfoQueue.task_done()  # tell the coordinator thread that it is done
 
 
-def ReadDataProcess(SerialCom, BaudRate, ReturnQueue):
+def ReadDataProcess(SerialCom, BaudRate, ReturnQueue, Stopping=None, ChunkPoints=None):
+    # reads the serial port until Stopping is set, the serial timeout bounds how long stopping takes
+    # with ChunkPoints the scans go out as (points, last) chunks of about ChunkPoints points, see StreamRotation
+    # serial is only imported here and in RealLidar, so ParsePacket and the processing work without pyserial
+    import serial
+
     try:
         Serial = serial.Serial(port=SerialCom, baudrate=BaudRate, timeout=1)
     except:
         print("Could not connect to serial port.")
+        ReturnQueue.put(None)
         exit()
 
     points = []
-    while True:
+    Rotations = queue.SimpleQueue()  # finished scans before they are streamed
+    Sent = 0  # points of the scan so far that were streamed
+    while Stopping is None or not Stopping.is_set():
         if not Serial.is_open:  # if the serial port is closed, exit the thread
-            return
+            break
 
         buffer = Serial.read_until(b"\xfa")  # read until the start byte is found
 
@@ -278,46 +401,93 @@ def ReadDataProcess(SerialCom, BaudRate, ReturnQueue):
             print("No data")
             continue
 
-        buffer = buffer[:-1]  # remove the start byte
-        buffer = [i for i in buffer]
-
-        if len(buffer) < 9:
-            # print("Buffer too short.")
-            continue
-
-        index = buffer[0] - 0xA0
-        # print("Index: " + str(index))
-
-        for j in range(0, 4):
-            # QuadrantOffset = math.floor(len(points) / 90) * 90
-            # print("Quadrant offset: " + str(QuadrantOffset))
-            angle = ((index * 4 + j) * math.pi / 180) % (2 * math.pi)
-            lowDist = buffer[1 + 2 * j]
-            highDist = buffer[2 + 2 * j]
-
-            if highDist & 0b_1000_0000 > 0:
-                #   points.append(Common.Position(angle, 0, False))
-                print("Invalid data at angle " + str(angle) + ".")
-                error = True
-                # continue
-            elif highDist & 0b_0100_0000 > 0:
-                print("Strength warning at angle" + str(angle))
-                error = True
-            else:
-                error = False
-
-            dist = highDist & 0b_0011_1111
-            dist <<= 8
-            dist |= lowDist
-            dist /= 20
-            # print("Angle: " + str(angle * 180 / math.pi) + ", Distance: " + str(dist))
-
-            if index * 4 + j == 0 or len(points) >= 360:
-                ReturnQueue.put(points.copy())
-                points = []
-                # if len(points) >= 360:
-                # print(index * 4 + j)
-                # print("Points sent to queue.")
-
-            if not error:
-                points.append(Common.Position(dist / 2, angle, False))
+        if ChunkPoints is None:
+            points = ParsePacket(buffer, points, ReturnQueue)
+        else:
+            points = ParsePacket(buffer, points, Rotations)
+            Sent = StreamRotation(points, Sent, Rotations, ReturnQueue, ChunkPoints)
+
+    Serial.close()
+    ReturnQueue.put(None)  # tell the coordinator reading stopped
+
+
+def ParsePacket(buffer, points, ReturnQueue):
+    """Parses one packet read from the lidar, up to and including the next start byte, into points.
+        A full rotation of points is put on ReturnQueue when the angle wraps around.
+
+    Args:
+        buffer (bytes): Bytes of the packet followed by the start byte of the next packet.
+        points (list): Points of the rotation so far.
+        ReturnQueue (multiprocessing.Queue): Queue the finished rotations are put on.
+
+    Returns:
+        list: Points of the rotation so far, a new list after a rotation was put on the queue.
+    """
+    buffer = buffer[:-1]  # remove the start byte
+    buffer = [i for i in buffer]
+
+    if len(buffer) < 9:
+        # print("Buffer too short.")
+        return points
+
+    index = buffer[0] - 0xA0
+    # print("Index: " + str(index))
+
+    for j in range(0, 4):
+        # QuadrantOffset = math.floor(len(points) / 90) * 90
+        # print("Quadrant offset: " + str(QuadrantOffset))
+        angle = ((index * 4 + j) * math.pi / 180) % (2 * math.pi)
+        lowDist = buffer[1 + 2 * j]
+        highDist = buffer[2 + 2 * j]
+
+        if highDist & 0b_1000_0000 > 0:
+            #   points.append(Common.Position(angle, 0, False))
+            print("Invalid data at angle " + str(angle) + ".")
+            error = True
+            # continue
+        elif highDist & 0b_0100_0000 > 0:
+            print("Strength warning at angle" + str(angle))
+            error = True
+        else:
+            error = False
+
+        dist = highDist & 0b_0011_1111
+        dist <<= 8
+        dist |= lowDist
+        dist /= 20
+        # print("Angle: " + str(angle * 180 / math.pi) + ", Distance: " + str(dist))
+
+        if index * 4 + j == 0 or len(points) >= 360:
+            ReturnQueue.put(points.copy())
+            points = []
+            # if len(points) >= 360:
+            # print(index * 4 + j)
+            # print("Points sent to queue.")
+
+        if not error:
+            points.append(Common.Position(dist / 2, angle, False))
+
+    return points
+
+
+def StreamRotation(points, Sent, Rotations, ReturnQueue, ChunkPoints=90):
+    """Puts the points read since the last chunk on ReturnQueue as a chunk once there are ChunkPoints of them.
+        When ParsePacket finished a rotation, the rest of it goes as the last chunk of its scan.
+
+    Args:
+        points (list): Points of the rotation so far, returned by ParsePacket.
+        Sent (int): Points of the rotation that were already put on ReturnQueue.
+        Rotations (queue.SimpleQueue): Queue ParsePacket put the finished rotations on.
+        ReturnQueue (multiprocessing.Queue): Queue the (points, last) chunks are put on.
+        ChunkPoints (int, optional): Points per chunk. Defaults to 90.
+
+    Returns:
+        int: Points of the current rotation that were put on ReturnQueue.
+    """
+    while not Rotations.empty():
+        ReturnQueue.put((Rotations.get()[Sent:], True))
+        Sent = 0
+    if len(points) - Sent >= ChunkPoints:
+        ReturnQueue.put((points[Sent:], False))
+        Sent = len(points)
+    return Sent
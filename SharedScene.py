@@ -0,0 +1,248 @@
+import Common, Environment
+from multiprocessing import shared_memory
+import numpy
+
+POSE_HEADER = 3  # frame, side size, robot count
+ROBOT_FIELDS = 4  # x, y, angle, diameter of each robot
+SCENE_HEADER = 3  # scene version, rock count, robot count
+
+
+class SharedScene:
+    def __init__(self, env):
+        """Publishes an environment into shared memory for the lidar processes. The rocks and dead angles are only
+            rewritten when the environment's SceneVersion changes, every frame only the small pose record is written.
+            The robots in env.Robots when the scene is created are published, robots added later are not.
+
+        Args:
+            env (Environment.Environment): Environment to publish.
+        """
+        self.env = env
+        self.Frame = 0
+        self.RobotCount = len(env.Robots)
+        PoseFields = POSE_HEADER + ROBOT_FIELDS * self.RobotCount
+        self.PoseMemory = shared_memory.SharedMemory(create=True, size=PoseFields * 8)
+        self.Pose = numpy.ndarray(PoseFields, dtype=numpy.float64, buffer=self.PoseMemory.buf)
+        self.SceneMemory = None
+        self.Capacity = 0
+        self.SceneVersion = None
+        self.DeadAngles = None
+        self.WriteScene()  # the pose is written by the first Publish
+
+    def __str__(self):
+        return f"SharedScene {self.SceneName} at frame {self.Frame}"
+
+    @property
+    def PoseName(self):
+        return self.PoseMemory.name
+
+    @property
+    def SceneName(self):
+        return self.SceneMemory.name
+
+    def Robots(self):
+        """Returns the published robots.
+
+        Returns:
+            list: The first RobotCount Common.Bots of env.Robots.
+        """
+        return self.env.Robots[: self.RobotCount]
+
+    def RobotDeadAngles(self):
+        """Returns the dead angles of the published robots as plain lists, to compare against the published ones.
+
+        Returns:
+            list: One list of [a,b] ranges per robot.
+        """
+        return [[list(deadRange) for deadRange in robot.DeadAngles] for robot in self.Robots()]
+
+    def Publish(self):
+        """Writes the current robot poses, and the scene if it changed, into shared memory.
+
+        Returns:
+            int: Frame number of the published poses.
+        """
+        env = self.env
+        env.UpdateRockIndex()  # bumps the scene version if Rocks was changed directly
+        if env.SceneVersion != self.SceneVersion or self.RobotDeadAngles() != self.DeadAngles:
+            self.WriteScene()
+
+        self.Frame += 1
+        self.Pose[:POSE_HEADER] = (self.Frame, env.SideSize, self.RobotCount)
+        self.Pose[POSE_HEADER:] = [
+            field
+            for robot in self.Robots()
+            for field in (robot.pos.x, robot.pos.y, robot.angle, robot.diameter)
+        ]
+        return self.Frame
+
+    def WriteScene(self):
+        """Writes the rocks and the dead angles of every robot, moving to a bigger block if they do not fit.
+        The dead angles are a count of ranges per robot followed by all the ranges."""
+        RockX, RockY, RockRadius = self.env.RockArrays()
+        RobotDeadAngles = self.RobotDeadAngles()
+        DeadCounts = [len(DeadAngles) for DeadAngles in RobotDeadAngles]
+        DeadAngles = numpy.array(
+            [
+                value
+                for DeadAngles in RobotDeadAngles
+                for deadRange in DeadAngles
+                for value in deadRange
+            ],
+            dtype=numpy.float64,
+        )
+        Needed = SCENE_HEADER + 3 * len(RockX) + self.RobotCount + len(DeadAngles)
+        if Needed > self.Capacity:  # workers follow the block by its name
+            if self.SceneMemory is not None:
+                self.SceneMemory.close()
+                self.SceneMemory.unlink()
+            self.Capacity = max(Needed, 2 * self.Capacity)
+            self.SceneMemory = shared_memory.SharedMemory(create=True, size=self.Capacity * 8)
+
+        Scene = numpy.ndarray(self.Capacity, dtype=numpy.float64, buffer=self.SceneMemory.buf)
+        Scene[1] = len(RockX)
+        Scene[2] = self.RobotCount
+        Scene[SCENE_HEADER:Needed] = numpy.concatenate(
+            (RockX, RockY, RockRadius, DeadCounts, DeadAngles)
+        )
+        self.SceneVersion = self.env.SceneVersion
+        self.DeadAngles = RobotDeadAngles
+        Scene[0] = Scene[0] + 1  # readers compare this counter, not the environment's version
+        del Scene  # release the buffer export so the block can be closed
+
+    def Close(self):
+        """Unlinks the shared memory so it is freed once every process let go of it.
+        The blocks stay mapped here, so a coordinator still publishing at exit does not fail."""
+        for memory in (self.PoseMemory, self.SceneMemory):
+            memory.unlink()
+
+
+class SceneReader:
+    def __init__(self, PoseName):
+        """Reads a SharedScene in a lidar process into a local environment that the scan methods run on.
+
+        Args:
+            PoseName (str): Name of the pose block, SharedScene.PoseName.
+        """
+        self.PoseMemory = shared_memory.SharedMemory(name=PoseName)
+        self.Pose = numpy.ndarray(
+            self.PoseMemory.size // 8, dtype=numpy.float64, buffer=self.PoseMemory.buf
+        )
+        self.SceneMemory = None
+        self.SceneName = None
+        self.SceneVersion = None
+        self.Frame = None  # frame of the poses in env, all the jobs of a frame share them
+        self.env = Environment.Environment(RockCount=0)
+
+    def __str__(self):
+        return f"SceneReader of {self.SceneName}"
+
+    def Read(self, SceneName):
+        """Updates the local environment from shared memory. The rocks are only rebuilt when the scene changed.
+
+        Args:
+            SceneName (str): Name of the scene block for this frame, SharedScene.SceneName.
+
+        Returns:
+            Tuple: (frame number, Environment.Environment) the environment is reused between frames.
+                Its Robots are the published robots, select the one to scan from with SelectRobot.
+        """
+        if SceneName != self.SceneName:
+            if self.SceneMemory is not None:
+                self.SceneMemory.close()
+            self.SceneMemory = shared_memory.SharedMemory(name=SceneName)
+            self.SceneName = SceneName
+            self.SceneVersion = None
+
+        Scene = numpy.ndarray(
+            self.SceneMemory.size // 8, dtype=numpy.float64, buffer=self.SceneMemory.buf
+        )
+        if Scene[0] != self.SceneVersion:
+            self.SceneVersion = Scene[0]
+            RockCount = int(Scene[1])
+            RobotCount = int(Scene[2])
+            Rocks = Scene[SCENE_HEADER : SCENE_HEADER + 3 * RockCount].reshape(3, RockCount)
+            DeadStart = SCENE_HEADER + 3 * RockCount
+            DeadCounts = Scene[DeadStart : DeadStart + RobotCount].astype(int).tolist()
+            Dead = Scene[DeadStart + RobotCount :][: 2 * sum(DeadCounts)].reshape(-1, 2).tolist()
+            self.env.Rocks = [
+                Common.Rock(Common.Position(x, y), 2 * radius)
+                for x, y, radius in zip(*Rocks.tolist())
+            ]
+            self.MatchRobots(RobotCount)
+            for robot, DeadCount in zip(self.env.Robots, DeadCounts):
+                robot.DeadAngles, Dead = Dead[:DeadCount], Dead[DeadCount:]
+            self.env.UpdateRockIndex()
+        del Scene
+
+        Frame = int(self.Pose[0])
+        if Frame != self.Frame:  # the poses only change once per frame
+            self.Frame = Frame
+            SideSize, RobotCount = self.Pose[1:POSE_HEADER].tolist()
+            self.MatchRobots(int(RobotCount))
+            Poses = self.Pose[POSE_HEADER : POSE_HEADER + ROBOT_FIELDS * int(RobotCount)]
+            for robot, (x, y, angle, diameter) in zip(
+                self.env.Robots, Poses.reshape(-1, ROBOT_FIELDS).tolist()
+            ):
+                robot.pos = Common.Position(x, y)
+                robot.angle = angle
+                robot.diameter = diameter
+            self.env.SideSize = SideSize
+        return Frame, self.env
+
+    def MatchRobots(self, RobotCount):
+        """Adds or removes local robots until there are RobotCount of them.
+
+        Args:
+            RobotCount (int): Number of published robots.
+        """
+        while len(self.env.Robots) < RobotCount:
+            self.env.AddRobot(Common.Bot())
+        del self.env.Robots[max(RobotCount, 1) :]
+        if self.env.Robot not in self.env.Robots:
+            self.env.SelectRobot(0)
+
+
+class SharedFrame:
+    def __init__(self, PointCount, Name=None):
+        """Shared frame buffer the lidar processes write their scan slices into, so results do not cross a queue.
+            Rows are field frame x, field frame y, robot frame x and robot frame y, one column per point slot.
+
+        Args:
+            PointCount (int): Number of point slots of the whole frame.
+            Name (str, optional): Name of an existing buffer to attach to. Defaults to None, create a new buffer.
+        """
+        self.PointCount = PointCount
+        self.Memory = shared_memory.SharedMemory(
+            name=Name, create=Name is None, size=max(4 * PointCount * 8, 8)
+        )
+        self.Data = numpy.ndarray((4, PointCount), dtype=numpy.float64, buffer=self.Memory.buf)
+
+    def __str__(self):
+        return f"SharedFrame {self.Name} with {self.PointCount} slots"
+
+    @property
+    def Name(self):
+        return self.Memory.name
+
+    def Write(self, Offset, Count, X, Y, RobotX, RobotY):
+        """Writes a slice of the frame. Slots the slice does not fill are set to nan.
+
+        Args:
+            Offset (int): First slot of the slice.
+            Count (int): Number of slots of the slice, extra points are cut off.
+            X (numpy.ndarray): Field frame x of the points.
+            Y (numpy.ndarray): Field frame y of the points.
+            RobotX (numpy.ndarray): Robot frame x of the points.
+            RobotY (numpy.ndarray): Robot frame y of the points.
+        """
+        Used = min(len(X), Count)
+        Slice = self.Data[:, Offset : Offset + Count]
+        Slice[0, :Used] = X[:Used]
+        Slice[1, :Used] = Y[:Used]
+        Slice[2, :Used] = RobotX[:Used]
+        Slice[3, :Used] = RobotY[:Used]
+        Slice[:, Used:] = numpy.nan
+
+    def Close(self):
+        """Unlinks the buffer, see SharedScene.Close."""
+        self.Memory.unlink()
@@ -1,29 +1,51 @@
-import Common, Environment, DigitalProcessing, guizero, multiprocessing, math, time, datetime, threading
+import Common, Environment, DigitalProcessing, Noise, SharedScene, Metrics, multiprocessing, math, time, datetime, threading, atexit, queue
 
 
 class LidarSim:
     def __init__(
         self,
-        env=Environment.Environment(),
+        env=None,
         ShowGui=True,
         GuiScale=150,
         ShowDeadAngles=True,
         ScanThreads=1,
         PointCount=800,
-        Processor=DigitalProcessing.LidarDataProcessor(),
+        Processor=None,
+        ScanMethod="March",
+        NoiseModel=None,
+        PipelineDepth=2,
+        ScanChunks=None,
+        MetricsPath=None,
+        MetricsInterval=10,
+        MetricsFormat="json",
+        ConflateFrames=True,
+        StreamChunks=False,
     ):
         """The LidarSim object is the main object for the lidar simulation. It handles the gui, the lidar threads, and the processing threads.
 
         Args:
-            env (Environment, optional): A custom environment can be passed in. Defaults to Environment.Environment().
-            ShowGui (bool, optional): Whether to create and update the gui. Defaults to True.
+            env (Environment, optional): A custom environment can be passed in. Every robot in env.Robots is scanned each frame, add the robots before starting the simulation. Defaults to None, a new Environment.Environment().
+            ShowGui (bool, optional): Whether to create and update the gui. Without the gui guizero is not imported and the processed frames are read with Frames or Run. Defaults to True.
             GuiScale (int, optional): Scale factor for the GUI. 1 is 1 foot to 1 px. Defaults to 150.
             ShowDeadAngles (bool, optional): If true, render green lines to show dead angles. Defaults to True.
             ScanThreads (int, optional): Number of threads to initialize for ray casting more is faster usually. Defaults to 1.
-            PointCount (int, optional): Total number of lidar points to calculate. Above 1000, gui fails. Defaults to 800.
-            Processor (DigitalProcessing.LidarDataProcessor, optional): The class that will do the actual processing. Defaults to DigitalProcessing.LidarDataProcessor().
+            PointCount (int, optional): Total number of lidar points to calculate per robot. Above 1000, gui fails. Defaults to 800.
+            Processor (DigitalProcessing.LidarDataProcessor, optional): The class that will do the actual processing. Defaults to None, a new DigitalProcessing.LidarDataProcessor().
+            ScanMethod (str, optional): "March" to step rays forward, "Analytic" to intersect rays in closed form, "Batch" to cast all rays as arrays or "Sweep" to project the rocks onto the rays. Defaults to "March".
+            NoiseModel (Noise.NoiseModel, optional): Noise added to the scans. Seeded models are reseeded for every frame and chunk, so seeded runs are reproducible. Defaults to None, a new Noise.UniformNoise().
+            PipelineDepth (int, optional): Scanned frames that can wait for processing. Scanning blocks when the pipeline is full. Defaults to 2.
+            ScanChunks (int, optional): Number of angle chunks the scan of each robot is split into. The lidar threads pull the chunks of all robots until none are left, so a slow direction does not hold up the frame. Defaults to None, about 8 chunks per thread over all robots.
+            MetricsPath (str, optional): File the stage timings and queue depths in Metrics are exported to. Defaults to None, no export.
+            MetricsInterval (float, optional): Seconds between metrics exports. Defaults to 10.
+            MetricsFormat (str, optional): "json" to append JSON lines or "prometheus" to rewrite a Prometheus text file. Defaults to "json".
+            ConflateFrames (bool, optional): If true, the processor skips to the newest scanned frame when it fell behind, the skipped frames are counted in Frame.Conflated.
+                If false, every frame is processed in order. Has no effect with StreamChunks. Defaults to True.
+            StreamChunks (bool, optional): If true, the chunks of the first robot's scan go to the processor as soon as they and the chunks before them are scanned,
+                so only the last chunk and FinishFrame are left once the last ray is cast. The processor needs BeginFrame, ProcessChunk and FinishFrame like
+                DigitalProcessing.LidarDataProcessor. If false, AcceptableProcess gets the whole scan. Defaults to False.
         """
-        self.env = env
+        # the defaults are built here and not in the signature, so importing Sim does not build a scene
+        self.env = env if env is not None else Environment.Environment()
         self.ShowGui = ShowGui
         self.GuiScale = GuiScale
         self.InitGuiScale = GuiScale
@@ -31,16 +53,52 @@ class LidarSim:
         self.ShowDeadAngles = ShowDeadAngles
         self.ScanThreads = ScanThreads
         self.PointCount = PointCount
+        self.ScanMethod = ScanMethod
+        self.NoiseModel = NoiseModel if NoiseModel is not None else Noise.UniformNoise()
 
-        self.Processor = Processor
+        self.Processor = (
+            Processor if Processor is not None else DigitalProcessing.LidarDataProcessor()
+        )
 
         self.AbsoluteLidarData = []
         self.RobotLidarData = []
 
         self.FrameTime = 0
 
-        self.ViewThread = threading.Thread(target=self.OpenGui)
-        self.ViewThread.start()
+        # scanned frames waiting for processing
+        self.FrameQueue = queue.Queue(maxsize=max(1, PipelineDepth))
+        self.ConflateFrames = ConflateFrames
+        self.ConflatedFrames = 0  # frames the processor skipped in total
+        self.StreamChunks = StreamChunks
+        # processed frames waiting for Frames, only without the gui
+        self.ProcessedQueue = None if self.ShowGui else queue.Queue(maxsize=max(1, PipelineDepth))
+        self.LastFrame = Common.Frame()  # last scanned frame
+        self.ProcessedFrame = Common.Frame()  # last processed frame, with the processing results
+
+        self.Stopping = threading.Event()  # set by Stop, the coordinators then stop their processes
+
+        self.Metrics = Metrics.Metrics()  # stage timings in seconds and queue depths
+        if MetricsPath is not None:
+            self.Metrics.StartExport(MetricsPath, MetricsInterval, MetricsFormat, self.Stopping)
+
+        if self.ShowGui:  # the gui thread is not a daemon, it keeps the program alive
+            self.ViewThread = threading.Thread(target=self.OpenGui)
+            self.ViewThread.start()
+
+        self.SharedEnv = SharedScene.SharedScene(self.env)  # rocks once, robot poses every frame
+        atexit.register(self.SharedEnv.Close)
+        self.RobotCount = self.SharedEnv.RobotCount
+
+        if ScanChunks is None:
+            ScanChunks = math.ceil(8 * self.ScanThreads / self.RobotCount)
+        self.ScanChunks = max(1, min(ScanChunks, self.PointCount))
+        # first ray of each chunk and the end, so every frame has exactly PointCount rays
+        self.ChunkStarts = ChunkStarts(self.PointCount, self.ScanChunks)
+        self.RobotPointCount = self.PointCount  # point slots of each robot
+        self.SharedFrame = SharedScene.SharedFrame(self.RobotPointCount * self.RobotCount)
+        atexit.register(self.SharedFrame.Close)
+        # rows x, y, robot x, robot y of the last frame, the robots one after the other
+        self.LidarFrame = self.SharedFrame.Data
 
         self.SendQueue = multiprocessing.JoinableQueue()
         self.ReturnQueue = multiprocessing.Queue()
@@ -48,19 +106,22 @@ class LidarSim:
         self.LidarScanData = [[[], []] for i in range(self.ScanThreads)]
         for i in range(
             self.ScanThreads
-        ):  # create the lidar threads and start them (each responsible for a portion of the lidar 1/ScanThreads of the lidar)
-            startangle = i / self.ScanThreads * 2 * math.pi
-            endangle = (i + 1) / self.ScanThreads * 2 * math.pi
+        ):  # create the lidar threads and start them (each pulls angle chunks of the scan from the send queue)
             self.LidarScanThreads.append(
                 multiprocessing.Process(
                     target=LidarThread,
                     args=(
                         [
-                            [startangle, endangle],
+                            self.ScanChunks,
                             i,
-                            int(round(self.PointCount / self.ScanThreads, 0)),
+                            self.PointCount,
                             self.SendQueue,
                             self.ReturnQueue,
+                            self.SharedEnv.PoseName,
+                            self.SharedFrame.Name,
+                            self.SharedFrame.PointCount,
+                            self.ScanMethod,
+                            self.NoiseModel,
                         ]
                     ),
                     daemon=True,
@@ -68,14 +129,14 @@ class LidarSim:
             )
             self.LidarScanThreads[i].start()
 
-        # start the coordinator threads and processes
-
-        self.LidarCoordinator = threading.Thread(target=self.LidarCoordinatorThread, daemon=True)
-        self.LidarCoordinator.start()
+        # start the coordinator threads and processes, the lidar coordinator streams chunks to the processor
 
         self.ProcessorInfoQueue = multiprocessing.JoinableQueue()
         self.ProcessorReturnQueue = multiprocessing.Queue()
 
+        self.LidarCoordinator = threading.Thread(target=self.LidarCoordinatorThread, daemon=True)
+        self.LidarCoordinator.start()
+
         self.ProcessorCoordinator = threading.Thread(
             target=self.ProcessQueueCoordinator, daemon=True
         )
@@ -89,9 +150,70 @@ class LidarSim:
         )
         self.ProcessorMultiProcess.start()
 
+    def Stop(self, timeout=None):
+        """Stops the coordinator threads and the lidar and processor processes and frees the shared memory.
+            Every thread and process finishes the frame it is on first. The gui is left open.
+
+        Args:
+            timeout (float, optional): Seconds to wait for each process. Defaults to None, wait until they stop.
+        """
+        self.Stopping.set()
+        while self.LidarCoordinator.is_alive() or self.ProcessorCoordinator.is_alive():
+            if self.ProcessedQueue is None:
+                self.ProcessorCoordinator.join()
+                continue
+            try:  # nobody reads the processed frames anymore, make room so the coordinators can finish
+                self.ProcessedQueue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        for process in self.LidarScanThreads + [self.ProcessorMultiProcess]:
+            process.join(timeout)
+        for shared in (self.SharedEnv, self.SharedFrame):
+            shared.Close()
+            atexit.unregister(shared.Close)
+        if self.ProcessedQueue is not None:
+            while not self.ProcessedQueue.empty():  # frames left after stopping are dropped
+                self.ProcessedQueue.get()
+            self.ProcessedQueue.put(None)  # ends Frames
+
+    def Frames(self):
+        """Yields every processed frame in order until the simulation is stopped. Only without the gui.
+
+        Returns:
+            generator: Common.Frame objects with the scan, the processing results and their timings.
+        """
+        if self.ProcessedQueue is None:
+            raise RuntimeError("Frames is only available with ShowGui=False")
+        while True:
+            Frame = self.ProcessedQueue.get()
+            if Frame is None:
+                self.ProcessedQueue.put(None)  # later calls end too
+                return
+            yield Frame
+
+    def Run(self, Frames=None):
+        """Runs the simulation without the gui for a number of frames, then stops it.
+
+        Args:
+            Frames (int, optional): Number of processed frames to run. Defaults to None, run until Stop is called from another thread.
+
+        Returns:
+            list: The processed Common.Frame objects in order.
+        """
+        Results = []
+        for Frame in self.Frames():
+            Results.append(Frame)
+            if Frames is not None and len(Results) >= Frames:
+                break
+        self.Stop()
+        return Results
+
     def OpenGui(self):
         # Initialize the gui and all the gui elements
         # it updates every 10ms
+        # guizero is only imported here so headless runs do not need it
+        import guizero
+
         if self.ShowGui:
             TotalWidth = self.env.SideSize * self.GuiScale
             self.app = guizero.App(
@@ -122,6 +244,7 @@ class LidarSim:
     def RedrawPoints(self):
         # redraws the points on the gui
         # calls different functions based on the view mode
+        start = time.time()
         self.GuiScale = self.GuiScaleSlider.value / 100 * self.InitGuiScale
         self.env.SideSize = self.InitSideSize * 1 / (self.GuiScaleSlider.value / 100)
 
@@ -131,6 +254,7 @@ class LidarSim:
             self.RobotPerspective()
         elif self.ViewMode.value == "Processed":
             self.ProcessedPerspective()
+        self.Metrics.Record("redraw", time.time() - start)
 
     def AbsolutePerspective(self):
         # draws the points from the lidar in the absolute perspective (field reference frame)
@@ -212,6 +336,26 @@ class LidarSim:
         ScaleFactor = (
             self.slider.value / 100
         )  # scale factor for the points make them bigger or smaller based on the slider
+        for robot in self.env.Robots:  # draw the other robots as their round bodies
+            if robot is self.env.Robot:
+                continue
+            radius = max(robot.diameter / 2, ScaleFactor)
+            self.canvas.oval(
+                (robot.pos.x + self.env.SideSize / 2 - radius) * self.GuiScale,
+                (robot.pos.y * -1 + self.env.SideSize / 2 - radius) * self.GuiScale,
+                (robot.pos.x + self.env.SideSize / 2 + radius) * self.GuiScale,
+                (robot.pos.y * -1 + self.env.SideSize / 2 + radius) * self.GuiScale,
+                color="red",
+            )
+        for AbsoluteLidarData, RobotLidarData in self.LastFrame.Scans[1:]:  # other robots' points
+            for point in AbsoluteLidarData:
+                self.canvas.oval(
+                    (point.x + self.env.SideSize / 2 - ScaleFactor) * self.GuiScale,
+                    (point.y * -1 + self.env.SideSize / 2 - ScaleFactor) * self.GuiScale,
+                    (point.x + self.env.SideSize / 2 + ScaleFactor) * self.GuiScale,
+                    (point.y * -1 + self.env.SideSize / 2 + ScaleFactor) * self.GuiScale,
+                    color="gray",
+                )
         for point in self.AbsoluteLidarData:  # draw the points
             # the radius is the scale factor
             # the center of the env is 0,0 but the canvas is 0,0 in the top left so we have to convert the coordinates
@@ -316,7 +460,7 @@ class LidarSim:
         # draws the points from the lidar in the processed perspective (robot reference frame)
         # usable points in the Process.AcceptableData are green
         # unusable points in the Process.IllegalData are red
-        # points of interest in the Process.POI are blue NOT IMPLEMENTED YET
+        # points of interest in the Process.POI are blue wall lines and orange rock circles
         def RobotPoint(offset=0):
             RobotPoint1 = Common.Position(
                 1.5, offset, False
@@ -432,44 +576,124 @@ class LidarSim:
 
     def LidarCoordinatorThread(self):
         # this thread is responsible for sending the lidar threads the environment and collecting the data
-        # this class can only communicate to the multiprocessing threads through queues
-        while True:
-            for i in range(
-                self.ScanThreads
-            ):  # que jobs for each thread, it passes the up-to-date environment to the threads
-                self.SendQueue.put(self.env)
+        # this class can only communicate to the multiprocessing threads through queues and the shared scene
+        # scanned frames are queued for processing, so frame N+1 is scanned while frame N is processed
+        while not self.Stopping.is_set():
+            # write the up-to-date robot pose (and rocks if they changed) for the threads
             start = time.time()  # start the timer
-
-            self.SendQueue.join()  # wait for all the threads to finish
+            FrameID = self.SharedEnv.Publish()
+            for robot in range(
+                self.RobotCount
+            ):  # que a job per chunk of every robot for the threads to pull
+                for chunk in range(self.ScanChunks):
+                    self.SendQueue.put((self.SharedEnv.SceneName, robot, chunk))
+            dispatched = time.time()
+            self.Metrics.Record("dispatch", dispatched - start)
+
+            Done = set()  # finished chunks of the first robot
+            Sent = 0  # chunks of the first robot sent to the processor, they go in angular order
+            StreamedPoints = []  # their robot frame points
+            # completion tokens in the order the chunks finish
+            for job in range(self.RobotCount * self.ScanChunks):
+                ThreadNumber, Frame, Robot, Chunk, ScanSeconds = self.ReturnQueue.get()
+                self.Metrics.Record(f"scan_worker_{ThreadNumber}", ScanSeconds)
+                if Robot == 0:
+                    Done.add(Chunk)
+                if self.StreamChunks and Sent in Done:
+                    # the chunks that are ready in angular order go as one
+                    First = Sent
+                    while Sent in Done:
+                        Sent += 1
+                    Slots = slice(self.ChunkStarts[First], self.ChunkStarts[Sent])
+                    Points = self.env.ArraysToPoints(*self.LidarFrame[2:4, Slots])
+                    self.ProcessorInfoQueue.put(("chunk", FrameID, Points))
+                    StreamedPoints += Points
+                    if Sent == self.ScanChunks:
+                        self.ProcessorInfoQueue.put(("finish", FrameID, None))
+            self.SendQueue.join()  # the tokens are all in, the threads are done
             end = time.time()  # stop the timer
 
-            self.AbsoluteLidarData = []
-            self.RobotLidarData = []
-            for i in range(self.ReturnQueue.qsize()):  # get the data from the threads
-                ThreadNumber, AbsoluteScanData, RobotScanData = self.ReturnQueue.get()
-                self.AbsoluteLidarData += AbsoluteScanData
-                self.RobotLidarData += RobotScanData
+            # the chunks are in angular order in the shared frame, convert it once for the gui and processor
+            Scans = []
+            for robot in range(self.RobotCount):
+                X, Y, RobotX, RobotY = self.LidarFrame[
+                    :, robot * self.RobotPointCount : (robot + 1) * self.RobotPointCount
+                ]
+                if robot == 0 and self.StreamChunks:  # the processor got these points
+                    RobotPoints = StreamedPoints
+                else:
+                    RobotPoints = self.env.ArraysToPoints(RobotX, RobotY)
+                Scans.append([self.env.ArraysToPoints(X, Y), RobotPoints])
+            self.LastFrame = Common.Frame(FrameID, start, *Scans[0], Scans)
+            self.LastFrame.ScanTime = end - start
+            self.Metrics.Record("scan", end - dispatched)
+            self.Metrics.Record("gather", time.time() - end)
+            self.AbsoluteLidarData = self.LastFrame.AbsoluteLidarData
+            self.RobotLidarData = self.LastFrame.RobotLidarData
             self.FrameTime = str(datetime.timedelta(seconds=end - start))[
                 5:
             ]  # calculate the time it took to run the lidar
             # time.sleep(5)
 
+            self.LastFrame.QueuedTime = time.time()
+            self.FrameQueue.put(self.LastFrame)  # blocks while the pipeline is full
+            self.Metrics.Gauge("frame_queue_depth", self.FrameQueue.qsize())
+
+        for i in range(self.ScanThreads):  # tell the threads to stop
+            self.SendQueue.put(None)
+        self.FrameQueue.put(None)  # tell the processing coordinator no more frames come
+
     def ProcessQueueCoordinator(self):
         # this thread is responsible for sending the lidar data to the processing thread and collecting the data
         # this class can only communicate to the multiprocessing threads through queues
+        # it processes every scanned frame in order until the lidar coordinator stops
         while True:
-            self.ProcessorInfoQueue.put(
-                self.RobotLidarData
-            )  # send the lidar data to the processing thread
-            self.ProcessorInfoQueue.join()  # wait for the processing thread to finish
-
-            (
-                self.Processor.AcceptableData,
-                self.Processor.IllegalData,
-                self.Processor.POI,
-            ) = (
+            Frame = self.FrameQueue.get()  # sleeps until a new frame is scanned
+            if Frame is None:
+                break
+            Frame.Conflated = 0
+            # skip to the newest frame if processing fell behind, streamed frames are all processed
+            while self.ConflateFrames and not self.StreamChunks:
+                try:
+                    Newer = self.FrameQueue.get_nowait()
+                except queue.Empty:
+                    break
+                if Newer is None:  # process the newest frame, then stop
+                    self.FrameQueue.put(None)
+                    break
+                Newer.Conflated = Frame.Conflated + 1
+                Frame = Newer
+            self.ConflatedFrames += Frame.Conflated
+            self.Metrics.Gauge("conflated_frames", self.ConflatedFrames)
+            # send the lidar data to the processing thread
+            start = time.time()
+            self.Metrics.Record("processor_queue_wait", start - Frame.QueuedTime)
+            if not self.StreamChunks:  # streamed frames were sent chunk by chunk while scanning
+                self.ProcessorInfoQueue.put(("frame", Frame.FrameID, Frame.RobotLidarData))
+                self.ProcessorInfoQueue.join()  # wait for the processing thread to finish
+
+            # get the data from the processing thread for the gui
+            FrameID, Frame.AcceptableData, Frame.IllegalData, Frame.POI, ProcessSeconds = (
                 self.ProcessorReturnQueue.get()
-            )  # get the data from the processing thread for the gui
+            )
+            if FrameID != Frame.FrameID:
+                raise RuntimeError(f"Processed frame {FrameID} instead of frame {Frame.FrameID}")
+            Frame.DoneTime = time.time()
+            Frame.ProcessTime = Frame.DoneTime - start
+            self.Metrics.Record("acceptable_process", ProcessSeconds)
+            self.Metrics.Record("process", Frame.ProcessTime)
+            self.Metrics.Record("latency", Frame.DoneTime - Frame.Time)
+            # from the last ray cast to the processed frame
+            self.Metrics.Record("post_scan_latency", Frame.DoneTime - Frame.Time - Frame.ScanTime)
+            self.ProcessedFrame = Frame
+            self.Processor.AcceptableData = Frame.AcceptableData
+            self.Processor.IllegalData = Frame.IllegalData
+            self.Processor.POI = Frame.POI
+            if self.ProcessedQueue is not None and not self.Stopping.is_set():
+                self.ProcessedQueue.put(Frame)  # blocks until Frames takes it
+                self.Metrics.Gauge("processed_queue_depth", self.ProcessedQueue.qsize())
+
+        self.ProcessorInfoQueue.put(None)  # tell the processing thread to stop
 
 
 def ProcessThread(Processor, ProcessorInfoQueue, ProcessorReturnQueue):
@@ -477,31 +701,119 @@ def ProcessThread(Processor, ProcessorInfoQueue, ProcessorReturnQueue):
     # it takes the lidar data and processes it
     # is is a separate process from the main process so it is encapsulated with limited access to the environment (no cheating)
     # it has the full performance of a python interpreter so it can be used to do more complex processing
+    # it blocks until data arrives and stops when it gets None
+    # a frame comes whole as ("frame", frame id, points) or as ("chunk", frame id, points) jobs and ("finish", frame id, None)
+    StreamedFrame = None  # frame the chunks belong to
+    Pending = None  # job taken from the queue while merging chunks
+    ProcessSeconds = 0
     while True:
-        if ProcessorInfoQueue.empty():
-            time.sleep(0.001)
-            continue
-        Processor.RobotLidarData = ProcessorInfoQueue.get()
+        Job = Pending if Pending is not None else ProcessorInfoQueue.get()
+        Pending = None
+        if Job is None:
+            ProcessorInfoQueue.task_done()
+            return
+        Kind, FrameID, Points = Job
+        while Kind == "chunk":  # chunks that queued up while processing are processed as one
+            try:
+                Pending = ProcessorInfoQueue.get_nowait()
+            except queue.Empty:
+                break
+            if Pending is None or Pending[:2] != ("chunk", FrameID):
+                break
+            Points = Points + Pending[2]
+            Pending = None
+            ProcessorInfoQueue.task_done()
         # add any more functions that need to be run here
-        print("Processing")
-        Processor.AcceptableProcess()
-        print("Acceptable Processed")
-        ProcessorReturnQueue.put((Processor.AcceptableData, Processor.IllegalData, Processor.POI))
+        start = time.time()
+        if Kind == "frame":
+            print("Processing")
+            Processor.RobotLidarData = Points
+            Processor.AcceptableProcess()
+        elif Kind == "chunk":
+            if FrameID != StreamedFrame:  # first chunk of a new frame
+                Processor.BeginFrame()
+                StreamedFrame = FrameID
+            Processor.ProcessChunk(Points)
+        else:
+            Processor.FinishFrame()
+        if Kind != "chunk":
+            Processor.FindPOI()  # rocks among the acceptable points
+        ProcessSeconds += time.time() - start
+        if Kind != "chunk":
+            print("Acceptable Processed")
+            ProcessorReturnQueue.put(
+                (
+                    FrameID,
+                    Processor.AcceptableData,
+                    Processor.IllegalData,
+                    Processor.POI,
+                    ProcessSeconds,
+                )
+            )
+            ProcessSeconds = 0
 
         ProcessorInfoQueue.task_done()  # tell the coordinator thread that it is done
 
 
-def LidarThread(StartStopAngles, ThreadNumber, PointCount, SendQueue, ReturnQueue):
+def ChunkStarts(PointCount, ChunkCount):
+    """Splits the rays of a scan into angle chunks. The rays left over from an even split go to the first chunks.
+
+    Args:
+        PointCount (int): Rays of the whole scan.
+        ChunkCount (int): Number of chunks, at most PointCount.
+
+    Returns:
+        list: First ray of each chunk, then PointCount.
+    """
+    Size, Extra = divmod(PointCount, ChunkCount)
+    return [chunk * Size + min(chunk, Extra) for chunk in range(ChunkCount + 1)]
+
+
+def LidarThread(
+    ChunkCount,
+    ThreadNumber,
+    PointCount,
+    SendQueue,
+    ReturnQueue,
+    PoseName,
+    FrameName,
+    FramePointCount,
+    ScanMethod="March",
+    NoiseModel=None,
+):
     # this is the lidar thread
     # it takes the environment and calculates the lidar data
     # it is a separate process from the main process so it is able to run in parallel with the main process
+    # each job is one of ChunkCount angle chunks of the scan of one robot, see ChunkStarts
+    if NoiseModel is None:
+        NoiseModel = Noise.UniformNoise()
+    NoiseModel.Seed(NoiseModel.InitSeed, ThreadNumber)
+    Scene = SharedScene.SceneReader(PoseName)  # local copy of the environment from shared memory
+    Output = SharedScene.SharedFrame(FramePointCount, FrameName)
+    Starts = ChunkStarts(PointCount, ChunkCount)
     while True:
-        if SendQueue.empty():
-            time.sleep(0.001)
-            continue
-        JobEnv = SendQueue.get()
-        AbsoluteScanData, RobotScanData = JobEnv.ScanLidar(
-            PointCount, JobEnv.SideSize / 1000, 0.05, StartStopAngles
+        Job = SendQueue.get()  # blocks until the next chunk, None to stop
+        if Job is None:
+            SendQueue.task_done()
+            return
+        SceneName, Robot, Chunk = Job
+        start = time.time()
+        Frame, JobEnv = Scene.Read(SceneName)  # the scene and poses are only read once per frame
+        JobEnv.SelectRobot(Robot)  # the other robots are obstacles for this robot's lidar
+        RobotCount = len(JobEnv.Robots)
+        if (
+            NoiseModel.InitSeed is not None
+        ):  # any thread can get a chunk, so seed by frame, robot and chunk
+            NoiseModel.Seed(NoiseModel.InitSeed, (Frame * RobotCount + Robot) * ChunkCount + Chunk)
+        # the angle range is in proportion to the rays, all rays are 2 pi / PointCount apart
+        First, End = Starts[Chunk], Starts[Chunk + 1]
+        StartStopAngles = [First / PointCount * 2 * math.pi, End / PointCount * 2 * math.pi]
+        X, Y = JobEnv.ScanArrays(
+            ScanMethod, End - First, JobEnv.SideSize / 1000, 0.05, StartStopAngles, noise=NoiseModel
         )
-        ReturnQueue.put([ThreadNumber, AbsoluteScanData, RobotScanData])
+        # the chunk's slice of the robot's part of the frame, so each robot's scan is in angular order
+        Offset = Robot * PointCount + First
+        Output.Write(Offset, End - First, X, Y, *JobEnv.ToRobotFrameArrays(X, Y))
+        # only a completion token with the scan time crosses the queue
+        ReturnQueue.put([ThreadNumber, Frame, Robot, Chunk, time.time() - start])
         SendQueue.task_done()
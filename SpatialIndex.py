@@ -0,0 +1,212 @@
+import math
+
+
+class RockGrid:
+    def __init__(self, Rocks=[], CellSize=None):
+        """Uniform grid over the bounding circles of the rocks, so ray queries only test the rocks in the cells a ray crosses.
+            The grid keeps a reference to the rock list, rocks are stored in the cells by their index in that list.
+
+        Args:
+            Rocks (list of Common.Rock, optional): Rocks to index. Defaults to [].
+            CellSize (float, optional): Side length of a grid cell. Defaults to None, picked from the rock count and spread.
+        """
+        self.Rocks = Rocks
+        self.InitCellSize = CellSize
+        self.Build()
+
+    def __str__(self):
+        return f"RockGrid with {self.CellCount}x{self.CellCount} cells and {self.Count} rocks"
+
+    def Build(self):
+        """(Re)builds the whole grid from the rock list. Needed after rocks are removed or a rock leaves the grid bounds."""
+        self.Count = len(self.Rocks)
+        if self.Count == 0:
+            self.MinX = self.MinY = 0
+            self.CellSize = 1
+            self.CellCount = 1
+            self.Cells = [[[]]]
+            return
+
+        self.MinX = min(rock.pos.x - rock.diameter / 2 for rock in self.Rocks)
+        self.MinY = min(rock.pos.y - rock.diameter / 2 for rock in self.Rocks)
+        MaxX = max(rock.pos.x + rock.diameter / 2 for rock in self.Rocks)
+        MaxY = max(rock.pos.y + rock.diameter / 2 for rock in self.Rocks)
+        Width = max(MaxX - self.MinX, MaxY - self.MinY, 1e-9)
+
+        if self.InitCellSize is None:
+            # about one rock per cell, but never smaller than the biggest rock
+            CellsPerSide = max(1, min(256, int(math.sqrt(self.Count))))
+            self.CellSize = max(Width / CellsPerSide, max(rock.diameter for rock in self.Rocks))
+        else:
+            self.CellSize = self.InitCellSize
+        # strictly covers the furthest rock edge
+        self.CellCount = math.floor(Width / self.CellSize) + 1
+
+        self.Cells = [[[] for y in range(self.CellCount)] for x in range(self.CellCount)]
+        for index in range(self.Count):
+            self.Insert(index)
+
+    def CellRange(self, rock):
+        """Returns the range of cells a rock's bounding box covers.
+
+        Args:
+            rock (Common.Rock): Rock to find the cells of.
+
+        Returns:
+            Tuple: (LowX, HighX, LowY, HighY) inclusive cell indices, None if the rock is outside of the grid.
+        """
+        radius = rock.diameter / 2
+        LowX = math.floor((rock.pos.x - radius - self.MinX) / self.CellSize)
+        HighX = math.floor((rock.pos.x + radius - self.MinX) / self.CellSize)
+        LowY = math.floor((rock.pos.y - radius - self.MinY) / self.CellSize)
+        HighY = math.floor((rock.pos.y + radius - self.MinY) / self.CellSize)
+        if LowX < 0 or LowY < 0 or HighX >= self.CellCount or HighY >= self.CellCount:
+            return None
+        return LowX, HighX, LowY, HighY
+
+    def Insert(self, index):
+        """Adds the rock at index in the rock list to the cells it covers.
+
+        Args:
+            index (int): Index of the rock in the rock list.
+        """
+        Range = self.CellRange(self.Rocks[index])
+        if Range is None:  # rock is outside of the grid bounds, grow the grid
+            self.Build()
+            return
+        for x in range(Range[0], Range[1] + 1):
+            for y in range(Range[2], Range[3] + 1):
+                self.Cells[x][y].append(index)
+
+    def Remove(self, index):
+        """Removes the rock at index in the rock list from the cells it currently covers.
+
+        Args:
+            index (int): Index of the rock in the rock list.
+        """
+        Range = self.CellRange(self.Rocks[index])
+        if Range is None:
+            return
+        for x in range(Range[0], Range[1] + 1):
+            for y in range(Range[2], Range[3] + 1):
+                if index in self.Cells[x][y]:
+                    self.Cells[x][y].remove(index)
+
+    def Add(self, rock):
+        """Appends a rock to the rock list and indexes it.
+
+        Args:
+            rock (Common.Rock): Rock to add.
+        """
+        self.Rocks.append(rock)
+        self.Count += 1
+        if self.Count == 1:
+            self.Build()
+        else:
+            self.Insert(self.Count - 1)
+
+    def Move(self, index, pos):
+        """Moves the rock at index to a new position and updates the cells it covers.
+
+        Args:
+            index (int): Index of the rock in the rock list.
+            pos (Common.Position): New position of the rock.
+        """
+        self.Remove(index)
+        self.Rocks[index].pos = pos
+        self.Insert(index)
+
+    def RocksNear(self, pos):
+        """Returns the rocks that could contain a position.
+
+        Args:
+            pos (Common.Position): Position to look up.
+
+        Returns:
+            list: List of Common.Rocks in the cell of the position.
+        """
+        x = math.floor((pos.x - self.MinX) / self.CellSize)
+        y = math.floor((pos.y - self.MinY) / self.CellSize)
+        if x < 0 or y < 0 or x >= self.CellCount or y >= self.CellCount:
+            return []
+        return [self.Rocks[index] for index in self.Cells[x][y]]
+
+    def RayQuery(self, origin, dx, dy, MaxDistance=math.inf):
+        """Finds the nearest rock hit by a ray, walking the grid cells the ray crosses in order (DDA traversal).
+
+        Args:
+            origin (Common.Position): Start of the ray.
+            dx (float): x component of the unit direction of the ray.
+            dy (float): y component of the unit direction of the ray.
+            MaxDistance (float, optional): Ignore hits further than this, like the border. Defaults to math.inf.
+
+        Returns:
+            Tuple: (distance, index) of the nearest rock hit, (None, None) if no rock is hit.
+        """
+        if self.Count == 0:
+            return None, None
+
+        # clip the ray to the grid bounds
+        GridSize = self.CellCount * self.CellSize
+        tEnter, tExit = 0, MaxDistance
+        for o, d, low in ((origin.x, dx, self.MinX), (origin.y, dy, self.MinY)):
+            if d == 0:
+                if o < low or o > low + GridSize:
+                    return None, None
+                continue
+            t1 = (low - o) / d
+            t2 = (low + GridSize - o) / d
+            tEnter = max(tEnter, min(t1, t2))
+            tExit = min(tExit, max(t1, t2))
+        if tEnter > tExit:
+            return None, None
+
+        x = min(
+            max(math.floor((origin.x + dx * tEnter - self.MinX) / self.CellSize), 0),
+            self.CellCount - 1,
+        )
+        y = min(
+            max(math.floor((origin.y + dy * tEnter - self.MinY) / self.CellSize), 0),
+            self.CellCount - 1,
+        )
+
+        # distance along the ray to the next vertical / horizontal cell edge and between edges
+        StepX = 1 if dx > 0 else -1
+        StepY = 1 if dy > 0 else -1
+        tDeltaX = self.CellSize / abs(dx) if dx != 0 else math.inf
+        tDeltaY = self.CellSize / abs(dy) if dy != 0 else math.inf
+        tMaxX = (
+            (self.MinX + (x + (dx > 0)) * self.CellSize - origin.x) / dx if dx != 0 else math.inf
+        )
+        tMaxY = (
+            (self.MinY + (y + (dy > 0)) * self.CellSize - origin.y) / dy if dy != 0 else math.inf
+        )
+
+        BestDistance = None
+        BestIndex = None
+        Tested = set()  # rocks spanning several cells are only intersected once
+        while 0 <= x < self.CellCount and 0 <= y < self.CellCount:
+            for index in self.Cells[x][y]:
+                if index in Tested:
+                    continue
+                Tested.add(index)
+                distance = self.Rocks[index].RayIntersect(origin, dx, dy)
+                if distance is not None and (BestDistance is None or distance < BestDistance):
+                    BestDistance = distance
+                    BestIndex = index
+
+            tNext = min(tMaxX, tMaxY)
+            if BestDistance is not None and BestDistance <= tNext:
+                break  # no later cell can hold a nearer hit
+            if tNext > tExit:
+                break
+            if tMaxX < tMaxY:
+                x += StepX
+                tMaxX += tDeltaX
+            else:
+                y += StepY
+                tMaxY += tDeltaY
+
+        if BestDistance is None or BestDistance > MaxDistance:
+            return None, None
+        return BestDistance, BestIndex
@@ -0,0 +1,23 @@
+import Benchmark, json
+
+
+def test_compare_reports_slower_and_missing_benchmarks():
+    Baseline = {"a": {"min": 1.0}, "b": {"min": 1.0}, "c": {"min": 1.0}}
+    Results = {"a": {"min": 1.1}, "b": {"min": 1.5}}
+    assert Benchmark.Compare(Results, Baseline, 0.2) == [("b", 1.0, 1.5), ("c", 1.0, None)]
+
+
+def test_a_failing_benchmark_fails_the_run(monkeypatch, tmp_path):
+    def Crash():
+        raise ValueError("crashed")
+
+    monkeypatch.setattr(
+        Benchmark, "ParsingCases", lambda Quick=False: [("parse/Crash", Crash), ("parse/Pass", int)]
+    )
+    Path = tmp_path / "baseline.json"
+    Path.write_text(
+        json.dumps({"results": {"parse/Crash": {"min": 1.0}, "parse/Pass": {"min": 1.0}}})
+    )
+    assert Benchmark.Main(["--quick", "-k", "parse/", "-r", "1"]) == 1
+    assert Benchmark.Main(["--quick", "-k", "parse/", "-r", "1", "-b", str(Path)]) == 1
+    assert Benchmark.Main(["--quick", "-k", "parse/Pass", "-r", "1", "-b", str(Path)]) == 0
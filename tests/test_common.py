@@ -0,0 +1,44 @@
+import Common
+
+
+class RecordingCanvas:
+    def __init__(self):
+        self.Ovals = []
+        self.Lines = []
+
+    def oval(self, x1, y1, x2, y2, **options):
+        self.Ovals.append((x1, y1, x2, y2))
+
+    def line(self, x1, y1, x2, y2, **options):
+        self.Lines.append((x1, y1, x2, y2))
+
+
+def test_circle_is_drawn_with_y_up_like_the_scan_points():
+    canvas = RecordingCanvas()
+    Common.Circle(Common.Position(1, 2), 0.5).Canvas(canvas, 10, 1)
+    x1, y1, x2, y2 = canvas.Ovals[0]
+    # the scan points are drawn at y * -1 + SideSize / 2
+    assert ((x1 + x2) / 2, (y1 + y2) / 2) == (6, 3)
+    assert (x2 - x1, y2 - y1) == (1, 1)
+
+
+def test_point_and_line_are_drawn_with_y_up_like_the_scan_points():
+    canvas = RecordingCanvas()
+    Common.POIPoint(Common.Position(1, 2)).Canvas(canvas, 10, 1)
+    Common.Line(Common.Position(1, 2), Common.Position(-3, -4)).Canvas(canvas, 10, 1)
+    x1, y1, x2, y2 = canvas.Ovals[0]
+    assert ((x1 + x2) / 2, (y1 + y2) / 2) == (6, 3)
+    assert canvas.Lines[0] == (6, 3, 2, 9)
+
+
+def test_line_is_drawn_in_the_same_frame_as_a_circle():
+    canvas = RecordingCanvas()
+    Center = Common.Position(1, 2)
+    Common.Circle(Center, 1).Canvas(canvas, 10, 1)
+    # from the center to the top of the circle
+    Common.Line(Center, Common.Position(1, 3)).Canvas(canvas, 10, 1)
+    x1, y1, x2, y2 = canvas.Ovals[0]
+    Start = (canvas.Lines[0][0], canvas.Lines[0][1])
+    End = (canvas.Lines[0][2], canvas.Lines[0][3])
+    assert Start == ((x1 + x2) / 2, (y1 + y2) / 2)
+    assert End == ((x1 + x2) / 2, y1)  # the top of the canvas is the smallest y
@@ -0,0 +1,101 @@
+import DigitalProcessing, Benchmark, Common, math
+import numpy
+
+
+def test_convex_hull_of_a_ring_keeps_every_point():
+    Processor = DigitalProcessing.LidarDataProcessor()
+    Angles = numpy.arange(5000) / 5000 * 2 * math.pi
+    Hull = Processor.ConvexHullIndices(numpy.cos(Angles), numpy.sin(Angles))
+    # counterclockwise from the leftmost point, at angle pi
+    assert Hull.tolist() == list(range(2500, 5000)) + list(range(2500))
+
+
+def test_convex_hull_contains_the_points():
+    Processor = DigitalProcessing.LidarDataProcessor()
+    Generator = numpy.random.default_rng(0)
+    for Size in (1, 2, 10, 1000):
+        X = Generator.integers(0, 20, Size).astype(float)  # duplicates and collinear points
+        Y = Generator.integers(0, 20, Size).astype(float)
+        Hull = Processor.ConvexHullIndices(X, Y)
+        assert len(set(zip(X[Hull].tolist(), Y[Hull].tolist()))) == len(Hull)
+        if len(Hull) < 3:
+            continue
+        Next = numpy.roll(Hull, -1)
+        Cross = (X[Next] - X[Hull]) * (Y[:, None] - Y[Hull]) - (Y[Next] - Y[Hull]) * (
+            X[:, None] - X[Hull]
+        )
+        assert (Cross >= 0).all()  # counterclockwise, no point right of an edge
+        assert (Cross[numpy.roll(Hull, -2), numpy.arange(len(Hull))] > 0).all()  # strict vertices
+
+
+def test_find_poi_twice_leaves_the_poi_unchanged():
+    Processor = DigitalProcessing.LidarDataProcessor()
+    Processor.AcceptableProcess(Benchmark.RobotScan(360))
+    Rocks = Processor.FindPOI()
+    assert Rocks
+    POI = list(Processor.POI)
+    assert Processor.FindPOI() and len(Processor.POI) == len(POI)
+    assert [type(Interest) for Interest in Processor.POI] == [type(Interest) for Interest in POI]
+
+    # a frame with too few points keeps the last result, finding the rocks again must not add them twice
+    for Frame in range(3):
+        Processor.AcceptableProcess([Common.Position(1, 1)])
+        Processor.FindPOI()
+        assert len(Processor.POI) == len(POI)
+
+
+def StreamScan(Processor, Points, Cuts):
+    Processor.BeginFrame()
+    for start, stop in zip([0] + Cuts, Cuts + [len(Points)]):
+        Processor.ProcessChunk(Points[start:stop])
+    Processor.FinishFrame()
+
+
+def test_chunked_scan_equals_whole_scan():
+    Generator = numpy.random.default_rng(1)
+    for Trial in range(60):
+        if Trial % 2:
+            Points = Benchmark.RobotScan(int(Generator.integers(3, 800)), Seed=Trial)
+        else:  # square room with points pulled in, rounded so there are collinear points
+            Size = int(Generator.integers(2, 800))
+            Angles = numpy.sort(Generator.random(Size) * 2 * math.pi)
+            Range = 8 / numpy.maximum(abs(numpy.cos(Angles)), abs(numpy.sin(Angles)))
+            Range *= 1 - 0.3 * (Generator.random(Size) < 0.2)
+            Points = [
+                Common.Position(x, y)
+                for x, y in zip(
+                    (Range * numpy.cos(Angles)).round(1).tolist(),
+                    (Range * numpy.sin(Angles)).tolist(),
+                )
+            ]
+        Whole = DigitalProcessing.LidarDataProcessor()
+        Whole.AcceptableProcess(Points)
+        Chunked = DigitalProcessing.LidarDataProcessor()
+        Cuts = sorted(
+            Generator.integers(0, len(Points) + 1, int(Generator.integers(0, 30))).tolist()
+        )
+        StreamScan(Chunked, Points, Cuts)
+        assert [id(point) for point in Chunked.IllegalData] == [
+            id(point) for point in Whole.IllegalData
+        ]
+        assert [id(point) for point in Chunked.AcceptableData] == [
+            id(point) for point in Whole.AcceptableData
+        ]
+
+
+def test_small_chunks_check_each_point_against_a_line_at_most_twice():
+    Points = Benchmark.RobotScan(2000)
+    Processor = DigitalProcessing.LidarDataProcessor()
+    Checks = []
+    NearLineCounts = Processor.NearLineCounts
+
+    def CountingNearLineCounts(Edges, start, stop):
+        Checks.append(len(Edges) * (stop - start))
+        return NearLineCounts(Edges, start, stop)
+
+    Processor.NearLineCounts = CountingNearLineCounts
+    Processor.AcceptableProcess(Points)
+    Whole = sum(Checks)
+    Checks.clear()
+    StreamScan(Processor, Points, list(range(4, len(Points), 4)))
+    assert sum(Checks) <= 2 * Whole + 2 * len(Points)
@@ -0,0 +1,52 @@
+import RealIntegration, DigitalProcessing, Benchmark, Common, multiprocessing, threading, queue, time
+
+
+class SlowProcessor(DigitalProcessing.LidarDataProcessor):
+    def FinishFrame(self):
+        time.sleep(0.05)  # slower than the rotations arrive
+        super().FinishFrame()
+
+
+def test_streamed_scans_are_skipped_when_the_processor_falls_behind():
+    # a RealLidar without the serial port and the gui, the rotations come from canned packets
+    Lidar = object.__new__(RealIntegration.RealLidar)
+    Lidar.StreamChunks = True
+    Lidar.Processor = SlowProcessor()
+    Lidar.RobotLidarData = []
+    Lidar.FrameQueue = queue.Queue()
+    Lidar.LastFrame = Common.Frame()
+    Lidar.ProcessedFrame = Common.Frame()
+    Lidar.ConflatedFrames = 0
+    Lidar.ProcessorInfoQueue = multiprocessing.JoinableQueue()
+    Lidar.ProcessorReturnQueue = multiprocessing.Queue()
+    Lidar.ReadReturnQueue = multiprocessing.Queue()
+    Processing = multiprocessing.Process(
+        target=RealIntegration.ProcessThread,
+        args=(Lidar.Processor, Lidar.ProcessorInfoQueue, Lidar.ProcessorReturnQueue),
+        daemon=True,
+    )
+    Processing.start()
+    Threads = [
+        threading.Thread(target=Lidar.ReadDataCoordinator),
+        threading.Thread(target=Lidar.ProcessQueueCoordinator),
+    ]
+    for Thread in Threads:
+        Thread.start()
+
+    Rotations = 20
+    points = []
+    Finished = queue.SimpleQueue()
+    Sent = 0
+    for Packet in Benchmark.CannedPackets(Rotations):
+        points = RealIntegration.ParsePacket(Packet, points, Finished)
+        Sent = RealIntegration.StreamRotation(points, Sent, Finished, Lidar.ReadReturnQueue, 90)
+    Lidar.ReadReturnQueue.put(None)
+    for Thread in Threads:
+        Thread.join(10)
+    Processing.join(10)
+
+    assert Lidar.LastFrame.FrameID == Rotations
+    # the rotations arrive faster than they are processed, so some are skipped instead of queued
+    assert Lidar.ConflatedFrames > 0
+    assert Lidar.ProcessedFrame.FrameID <= Rotations
+    assert Processing.exitcode == 0
@@ -0,0 +1,35 @@
+import Sim, Environment, Noise, math
+import numpy
+import pytest
+
+
+def test_chunk_starts_cover_every_ray():
+    assert Sim.ChunkStarts(360, 32) == [chunk * 11 + min(chunk, 8) for chunk in range(33)]
+    assert Sim.ChunkStarts(90, 32)[-1] == 90
+    assert Sim.ChunkStarts(7, 7) == list(range(8))
+
+
+@pytest.mark.parametrize("PointCount, ScanChunks", [(360, 32), (90, 32), (361, 7)])
+def test_frames_have_point_count_rays(PointCount, ScanChunks):
+    env = Environment.Environment(RockCount=5, SideSize=12)
+    sim = Sim.LidarSim(
+        env=env,
+        ShowGui=False,
+        ScanThreads=2,
+        PointCount=PointCount,
+        ScanChunks=ScanChunks,
+        ScanMethod="Analytic",
+        NoiseModel=Noise.NoiseModel(),  # exact points, so the ray angles can be checked
+    )
+    Frames = sim.Run(Frames=2)
+    assert [len(Frame.RobotLidarData) for Frame in Frames] == [PointCount] * len(Frames)
+
+    # the rays of all chunks are evenly spaced around the circle
+    Angles = numpy.array(
+        [
+            math.atan2(point.y - env.Robot.pos.y, point.x - env.Robot.pos.x)
+            for point in Frames[-1].AbsoluteLidarData
+        ]
+    )
+    Expected = env.Robot.angle + numpy.arange(PointCount) * 2 * math.pi / PointCount
+    assert numpy.allclose(numpy.angle(numpy.exp(1j * (Angles - Expected))), 0, atol=1e-9)